@@ -1,65 +1,225 @@
+import math
 import pygame
-from sudoku_generator import generate_sudoku
+from puzzle_id import new_puzzle_id, puzzle_from_id
 from constants import *
 from cell import Cell
+from glyph_cache import glyphs
+from game_state import GameState
+from history import History, VALUE, SKETCH, MARKS, apply
+from metrics import metrics
 
 class Board:
-    def __init__(self, width, height, screen, difficulty):
+    # source is optional and must have a get(difficulty, size) method returning a
+    # (board, solution) pair, a (board, solution, trace) or (board, solution, trace, puzzle_id)
+    # tuple, or None, e.g. a PuzzleBank or PuzzlePool. Without one, or when it
+    # has nothing for this difficulty and size, a new puzzle is generated right here,
+    # which takes seconds on big boards (the game avoids that, see Game.start_game).
+    # puzzle is optional: a tuple like the ones source returns, used instead of asking source
+    # size is the number of rows/columns and must be a perfect square (9, 16, 25, ...)
+    # state is optional: the GameState of a previous game, whose buffers are reused
+    # cells is optional: the flat Cell list of that previous game, reused when it is a view of the same state
+    # saved is optional: a SavedGame (see savegame.py) to carry on with instead of a new puzzle
+    def __init__(self, width, height, screen, difficulty, source=None, size=9, state=None, saved=None, puzzle=None,
+                 cells=None):
+        if saved is not None:
+            size = saved.state.size
         self.width = width
         self.height = height
         self.screen = screen
-        self.cells = []
+        self.size = size
+        self.box_size = math.isqrt(size)
         self.selected_cell = None
+        self.auto_eliminate = AUTO_ELIMINATE_MARKS
 
-        difficulty_cells = {"EASY": 30, "MEDIUM": 40, "HARD": 50}
-        removed_cells = difficulty_cells[difficulty]
-        self.board, self.solvedBoard = generate_sudoku(9, removed_cells)
-
-        cell_width = width/9
-        cell_height = height/9
-        for i in range(9):
-            row = []
-            for j in range(9):
-                row.append(Cell(self.board[i][j], i, j, self.screen, cell_width, cell_height))
-            self.cells.append(row)
+        if saved is not None:
+            self.puzzle_id = saved.puzzle_id
+            self.auto_eliminate = saved.auto_eliminate
+            self.state = saved.state
+        else:
+            if puzzle is None and source is not None:
+                puzzle = source.get(difficulty, size)
+            if puzzle is None:
+                puzzle_id = new_puzzle_id(difficulty, size)
+                puzzle = puzzle_from_id(puzzle_id) + (None, puzzle_id)
+            # Short ID that regenerates this puzzle (see puzzle_id.py), None if the source had none
+            self.puzzle_id = puzzle[3] if len(puzzle) > 3 else None
+            # The grader's solve trace drives hints; sources may hand it over with the puzzle
+            trace = puzzle[2] if len(puzzle) > 2 else None
+            if state is None:
+                state = GameState(size)
+            self.state = state.load(puzzle[0], puzzle[1], trace)
+
+        # Every change to the cells is logged here for undo and redo, starting from the board as it is now
+        self.history = History(state=self.state)
+
+        # Every cell is drawn at this size
+        self.cell_width = width/size
+        self.cell_height = height/size
+        # Cells by flat index, then by row and column
+        if cells is not None and len(cells) == size * size and cells[0].state is self.state:
+            for cell in cells:
+                cell.board = self
+                cell.reset()
+            self.flat = cells
+        else:
+            self.flat = [Cell(self.state, i, self) for i in range(size * size)]
+        self.cells = [self.flat[i * size:(i + 1) * size] for i in range(size)]
+
+        self.conflict_cells = set()
+        self.update_conflicts()
+        glyphs.prerender_digits(self.cell_height, size, (GIVEN_COLOR, ENTERED_COLOR, SKETCH_COLOR, CONFLICT_COLOR))
+
+    # The puzzle and its solution as 2D lists, built from the state
+    @property
+    def board(self):
+        return self.state.puzzle()
+
+    @property
+    def solvedBoard(self):
+        return self.state.grid(self.state.solution)
+
+    def set_value(self, cell, value):
+        '''
+        Change a cell's value through the state, which keeps the counters
+        Every change to a cell's value should go through here
+        '''
+        old = cell.value
+        changed = self.state.set_value(cell.index, value, self.auto_eliminate)
+        if changed:
+            with self.history.group():
+                self.history.record(cell.index, VALUE, old, value)
+                # The other changed cells lost the value from their marks
+                bit = 1 << (value - 1) if value else 0
+                for i in changed[1:]:
+                    self.history.record(i, MARKS, self.state.marks[i] | bit, self.state.marks[i])
+        for i in changed:
+            self.flat[i].dirty = True
+        self.update_conflicts()
+
+    def set_sketch(self, cell, value):
+        self.history.record(cell.index, SKETCH, cell.sketched_value, value)
+        cell.set_sketched_value(value)
+
+    def set_marks(self, cell, marks):
+        self.history.record(cell.index, MARKS, cell.marks, marks)
+        cell.marks = marks
+
+    def undo(self):
+        # Take back the last move. Returns False if there was nothing to undo
+        group = self.history.undo()
+        if group is None:
+            return False
+        self.apply(group, False)
+        return True
+
+    def redo(self):
+        # Make the last undone move again. Returns False if there was nothing to redo
+        group = self.history.redo()
+        if group is None:
+            return False
+        self.apply(group, True)
+        return True
+
+    def apply(self, group, forward):
+        for i in apply(self.state, group, forward):
+            self.flat[i].dirty = True
+        self.update_conflicts()
+
+    def update_conflicts(self):
+        # Flag every cell whose value is repeated in one of its units
+        conflict_cells = {self.flat[i] for i in self.state.conflicts()}
+        for cell in self.conflict_cells - conflict_cells:
+            cell.conflict = False
+        for cell in conflict_cells - self.conflict_cells:
+            cell.conflict = True
+        self.conflict_cells = conflict_cells
+
+    def conflicts(self):
+        # Returns the (row, col) of every cell that breaks a rule
+        return {(cell.row, cell.col) for cell in self.conflict_cells}
+
+    def hint(self, time_limit=HINT_TIME_LIMIT):
+        '''
+        Returns the next useful step as a grader Step(cell, digit, technique), or None if the board is full
+        See GameState.hint.
+        '''
+        return self.state.hint(time_limit)
+
+    @metrics.timed("board.draw")
     def draw(self):
         #Draw grid lines
-        for i in range(1,10):
-            if i % 3 == 0:
-                line_width = 4
-            else:
-                line_width = 1
-            pygame.draw.line(self.screen, (0,0,0),(0,i*self.height//9),(self.width,i*self.height//9),line_width)
-            pygame.draw.line(self.screen, (0,0,0), (i*self.width//9,0),(i*self.width//9,self.height),line_width)
+        self.drawgrid()
 
         #Draw cells
         for row in self.cells:
             for cell in row:
                 cell.draw()
+                cell.dirty = False
+
+    @metrics.timed("board.draw_dirty")
+    def draw_dirty(self):
+        '''
+        Redraw only the cells that changed since they were last drawn
+        Returns the list of screen rects that were touched, for pygame.display.update
+        '''
+        rects = []
+        for row in self.cells:
+            for cell in row:
+                if cell.dirty:
+                    rects.append(self.draw_cell(cell))
+        return rects
+
+    def draw_cell(self, cell):
+        # Repaint one cell: background, contents, then the grid lines around it
+        x0 = cell.col * self.width // self.size
+        x1 = (cell.col + 1) * self.width // self.size
+        y0 = cell.row * self.height // self.size
+        y1 = (cell.row + 1) * self.height // self.size
+        pygame.draw.rect(self.screen, BG_COLOR, (x0, y0, x1 - x0, y1 - y0))
+        cell.draw()
+        cell.dirty = False
+
+        if cell.row > 0:
+            pygame.draw.line(self.screen, (0,0,0), (x0, y0), (x1, y0), self.line_width(cell.row))
+        pygame.draw.line(self.screen, (0,0,0), (x0, y1), (x1, y1), self.line_width(cell.row + 1))
+        if cell.col > 0:
+            pygame.draw.line(self.screen, (0,0,0), (x0, y0), (x0, y1), self.line_width(cell.col))
+        pygame.draw.line(self.screen, (0,0,0), (x1, y0), (x1, y1), self.line_width(cell.col + 1))
+
+        # Thick lines spill a couple of pixels past the cell edge
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0).inflate(4, 4)
+
+    def line_width(self, i):
+        # Width of the i-th grid line: thick around boxes, thin between cells
+        if i % self.box_size == 0:
+            return 4
+        return 1
+
     def drawgrid(self):
-        for i in range(1,10):
-            if i % 3 == 0:
-                line_width = 4
-            else:
-                line_width = 1
-            pygame.draw.line(self.screen, (0,0,0),(0,i*self.height//9),(self.width,i*self.height//9),line_width)
-            pygame.draw.line(self.screen, (0,0,0), (i*self.width//9,0),(i*self.width//9,self.height),line_width)
+        for i in range(1,self.size+1):
+            line_width = self.line_width(i)
+            pygame.draw.line(self.screen, (0,0,0),(0,i*self.height//self.size),(self.width,i*self.height//self.size),line_width)
+            pygame.draw.line(self.screen, (0,0,0), (i*self.width//self.size,0),(i*self.width//self.size,self.height),line_width)
             
+    # Moves the selection to (row, col). Positions off the board keep the current selection
     def select(self, row, col):
-        if row in range(0,9) and col in range(0,9) :
+        if row in range(0,self.size) and col in range(0,self.size) :
+            if self.selected_cell is not None:
+                self.selected_cell.selected = False
             self.selected_cell = self.cells[row][col]
             self.selected_cell.selected = True
-            self.draw()
-        else:
-            self.draw()
-            pass
+
+    def deselect(self):
+        if self.selected_cell is not None:
+            self.selected_cell.selected = False
+        self.selected_cell = None
             
+    # Returns the (row, col) of the cell under pixel (y, x), or None off the board.
+    # Inverts draw_cell's i * width // size exactly, since cells need not be whole pixels (600 / 16 = 37.5)
     def click(self, row, col):
-        cell_width = self.width // 9
-        cell_height = self.height // 9
-        if row // cell_width in range(len(self.cells)) and col // cell_height in range (len(self.cells[0])):
-            return row // cell_width, col // cell_height
-        self.selected_cell = None
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return ((row + 1) * self.size - 1) // self.height, ((col + 1) * self.size - 1) // self.width
+        self.deselect()
         return None
             
         
@@ -68,22 +228,59 @@ class Board:
     
     def clear(self):
         if self.selected_cell and not self.selected_cell.is_initial:
-            self.selected_cell.value = 0
+            self.set_value(self.selected_cell, 0)
         return self.selected_cell
     
     def sketch(self, value):
-        self.selected_cell.set_sketched_value(value)
+        self.set_sketch(self.selected_cell, value)
         
         
+    # Turns pencil mark value on or off in the selected cell
+    def toggle_mark(self, value):
+        cell = self.selected_cell
+        if cell is None or cell.value != 0:
+            return
+        self.set_marks(cell, cell.marks ^ 1 << (value - 1))
+
+    def fill_marks(self):
+        # Mark every possible value in every empty cell, as one move
+        old = self.state.marks[:]
+        self.state.fill_marks()
+        with self.history.group():
+            for cell in self.flat:
+                if cell.value == 0:
+                    self.history.record(cell.index, MARKS, old[cell.index], cell.marks)
+                    cell.dirty = True
+
+    def clear_marks(self):
+        with self.history.group():
+            for row in self.cells:
+                for cell in row:
+                    if cell.marks:
+                        self.set_marks(cell, 0)
+
     def place_number(self, value):
-        self.selected_cell.set_cell_value(value)
+        self.set_value(self.selected_cell, value)
+
+    # Turns the selected cell's sketched value into its value. Returns True if it did
+    def commit_sketch(self):
+        cell = self.selected_cell
+        if cell is None or cell.value != 0 or cell.sketched_value == 0:
+            return False
+        with self.history.group():
+            self.set_value(cell, cell.sketched_value)
+            self.set_sketch(cell, 0)
+        return True
         
+    # Clears everything the player entered. It is one move, so one undo brings it all back
     def reset_to_original(self):
-        for row in self.cells:
-            for cell in row:
-                if not cell.is_initial:
-                    cell.set_cell_value(0)
-                    cell.set_sketched_value(0)
+        with self.history.group():
+            for row in self.cells:
+                for cell in row:
+                    if not cell.is_initial:
+                        self.set_value(cell, 0)
+                        self.set_sketch(cell, 0)
+                        self.set_marks(cell, 0)
 
         
                     
@@ -92,19 +289,12 @@ class Board:
         
         
     def is_full(self):
-        cellcount = 0
-        for i in self.cells:
-            for cell in i:
-                if cell.value != 0:
-                    cellcount += 1
-        if cellcount == 81:
-            return True
-        return False
+        return self.state.is_full()
                 
     def update_board(self):
         row = self.selected_cell.row
         col = self.selected_cell.col
-        self.cells[row][col].value = self.selected_cell.value
+        self.set_value(self.cells[row][col], self.selected_cell.value)
         
     def find_empty(self):
         for i in self.cells:
@@ -113,11 +303,7 @@ class Board:
                     return cell.row, cell.col
     
     def check_board(self):
-        # Check rows
-        for row in range(len(self.cells)):
-            for cell in range(len(self.cells[row])):
-                if self.cells[row][cell].value != self.solvedBoard[row][cell]:
-                    return False
-        return True
+        # Any full grid that follows the rules wins, even if it differs from solvedBoard
+        return self.state.is_solved()
         
     
\ No newline at end of file
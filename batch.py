@@ -0,0 +1,117 @@
+'''
+Generates many puzzles at once across a pool of worker processes
+
+Every puzzle gets its own seed derived from the batch seed and its index, so a
+batch can be reproduced exactly no matter how many workers produced it or in
+which order the results came back.
+
+Example:
+    for index, board, solution in generate_batch(1000, removed=50, seed=7):
+        ...
+'''
+
+import itertools
+import multiprocessing
+import os
+import queue
+from collections import deque
+
+from sudoku_generator import generate_sudoku
+
+
+def item_seed(seed, index):
+    '''
+    Seed used for puzzle number index of a batch started with seed
+    '''
+    return (seed << 32) + index
+
+
+def generate_one(job):
+    '''
+    Worker function: generate a single puzzle from a (index, size, removed, unique, seed) tuple
+
+    Returns:
+        (index, board, solution)
+    '''
+    index, size, removed, unique, seed = job
+    board, solution = generate_sudoku(size, removed, unique, item_seed(seed, index))
+    return index, board, solution
+
+
+def generate_chunk(job):
+    '''
+    Worker function: generate puzzles start..stop-1 from a (start, stop, size, removed, unique, seed) tuple
+
+    Returns:
+        list of (index, board, solution)
+    '''
+    start, stop, size, removed, unique, seed = job
+    return [generate_one((index, size, removed, unique, seed)) for index in range(start, stop)]
+
+
+def generate_batch(count, removed, size=9, unique=True, seed=0, workers=None, chunksize=16, ordered=False,
+                   window=None):
+    '''
+    Generate count puzzle/solution pairs, yielding them as soon as they are ready
+
+    Parameters:
+        count: number of puzzles to generate
+        removed: number of cells to clear in each puzzle
+        size: number of rows/columns of each board
+        unique: only keep removals that leave one solution (see SudokuGenerator)
+        seed: batch seed; puzzle i always comes out the same for the same seed
+        workers: number of worker processes (default: one per CPU). 1 runs in this process
+        chunksize: number of puzzles handed to a worker at a time
+        ordered: yield results in index order instead of completion order
+        window: most puzzles handed to the pool at once (default: 4 chunks per worker).
+            A new chunk is handed over each time one comes back, so workers never
+            wait on each other and memory stays bounded for any count
+
+    Yields:
+        (index, board, solution)
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        for index in range(count):
+            yield generate_one((index, size, removed, unique, seed))
+        return
+
+    if window is None:
+        window = workers * chunksize * 4
+    in_flight = max(1, window // chunksize)
+    chunks = ((start, min(count, start + chunksize), size, removed, unique, seed)
+              for start in range(0, count, chunksize))
+
+    with multiprocessing.Pool(workers) as pool:
+        if ordered:
+            # Chunks come back in the order they were handed out; the others keep running meanwhile
+            pending = deque(pool.apply_async(generate_chunk, (job,)) for job in itertools.islice(chunks, in_flight))
+            while pending:
+                results = pending.popleft().get()
+                job = next(chunks, None)
+                if job is not None:
+                    pending.append(pool.apply_async(generate_chunk, (job,)))
+                yield from results
+        else:
+            # Chunks come back as they finish
+            finished = queue.Queue()
+
+            def submit(job):
+                pool.apply_async(generate_chunk, (job,), callback=finished.put, error_callback=finished.put)
+
+            running = 0
+            for job in itertools.islice(chunks, in_flight):
+                submit(job)
+                running += 1
+            while running:
+                results = finished.get()
+                running -= 1
+                if isinstance(results, BaseException):
+                    raise results
+                job = next(chunks, None)
+                if job is not None:
+                    submit(job)
+                    running += 1
+                yield from results
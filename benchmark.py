@@ -0,0 +1,199 @@
+'''
+Benchmark suite for puzzle generation, checking and drawing
+
+Measures:
+    generate/<DIFFICULTY>   generate_sudoku as Board calls it (unique puzzles)
+    fill_remaining          time and backtrack count of the backtracking fill
+    variant                 VariantPool.get, a disguised copy of a graded seed puzzle
+    check_board / is_full   Board's end-of-game checks on a finished board
+    draw                    a full Board.draw frame (SDL dummy video driver, no window)
+
+Run with:
+    python3 benchmark.py                                # print a table
+    python3 benchmark.py --output results.json          # also save the results
+    python3 benchmark.py --baseline results.json        # flag regressions against saved results
+
+Exits with status 1 when any workload is slower than the baseline by more than --tolerance.
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Draw without opening a window. Must be set before pygame creates a display
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from batch import item_seed
+from constants import DIFFICULTY_CELLS, WIDTH, HEIGHT
+from sudoku_generator import SudokuGenerator, generate_sudoku
+from variants import VariantPool
+
+
+def percentile(sorted_times, pct):
+    # Nearest-rank percentile of an already sorted list
+    index = min(len(sorted_times) - 1, int(round(pct / 100 * (len(sorted_times) - 1))))
+    return sorted_times[index]
+
+
+def summarize(times, **extra):
+    '''
+    Turn a list of per-run times (seconds) into a result dict (milliseconds)
+    '''
+    times = sorted(times)
+    total = sum(times)
+    result = {
+        "runs": len(times),
+        "mean_ms": total / len(times) * 1000,
+        "p50_ms": percentile(times, 50) * 1000,
+        "p95_ms": percentile(times, 95) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+        "max_ms": times[-1] * 1000,
+        "per_sec": len(times) / total if total else float("inf"),
+    }
+    result.update(extra)
+    return result
+
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_generate(difficulty, runs, seed, unique=True):
+    removed = DIFFICULTY_CELLS[difficulty]
+    seeds = iter(range(runs))
+    return summarize(timed(lambda: generate_sudoku(9, removed, unique, item_seed(seed, next(seeds))), runs))
+
+
+def bench_fill_remaining(runs, seed):
+    times = []
+    backtracks = []
+    for index in range(runs):
+        sudoku = SudokuGenerator(9, 0, rng=random.Random(item_seed(seed, index)))
+        sudoku.fill_diagonal()
+        start = time.perf_counter()
+        sudoku.fill_remaining(0, sudoku.box_length)
+        times.append(time.perf_counter() - start)
+        backtracks.append(sudoku.backtracks)
+    backtracks.sort()
+    return summarize(times, backtracks_mean=sum(backtracks) / runs,
+                     backtracks_p95=percentile(backtracks, 95), backtracks_max=backtracks[-1])
+
+
+def bench_variant(runs, seed):
+    variants = VariantPool.generate(3, seed, random.Random(seed))
+    difficulty = max(variants.seeds, key=variants.ready)
+    return summarize(timed(lambda: variants.get(difficulty), runs))
+
+
+def solved_board(screen):
+    # A Board whose cells are all filled in with the solution
+    from Board import Board
+    board = Board(WIDTH, WIDTH, screen, "EASY")
+    for row in board.cells:
+        for cell in row:
+            board.set_value(cell, cell.solution)
+    return board
+
+
+def bench_board(runs):
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    board = solved_board(screen)
+
+    def draw():
+        screen.fill((255, 255, 255))
+        board.draw()
+
+    results = {
+        "check_board": summarize(timed(board.check_board, runs)),
+        "is_full": summarize(timed(board.is_full, runs)),
+        "draw": summarize(timed(draw, runs)),
+    }
+    pygame.quit()
+    return results
+
+
+def run_all(runs, seed):
+    # Every workload gets the same seeded puzzles on every run, so results are comparable
+    random.seed(seed)
+    results = {}
+    for difficulty in DIFFICULTY_CELLS:
+        results[f"generate/{difficulty}"] = bench_generate(difficulty, runs, seed)
+    results["fill_remaining"] = bench_fill_remaining(runs, seed)
+    results["variant"] = bench_variant(runs, seed)
+    results.update(bench_board(runs))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Return a list of (name, baseline p50, current p50) for workloads whose
+    median got slower than the baseline by more than tolerance (0.2 = 20%)
+    '''
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append((name, old["p50_ms"], result["p50_ms"]))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'workload':<18} {'runs':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per sec':>10}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['runs']:>5} {r['mean_ms']:9.3f} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} "
+              f"{r['p99_ms']:9.3f} {r['per_sec']:10.1f}")
+    fill = results.get("fill_remaining")
+    if fill:
+        print(f"fill_remaining backtracks: mean {fill['backtracks_mean']:.1f}, "
+              f"p95 {fill['backtracks_p95']}, max {fill['backtracks_max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark puzzle generation, checking and drawing")
+    parser.add_argument("--runs", type=int, default=200, help="runs per workload")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_all(args.runs, args.seed)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "runs": args.runs,
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: p50 {old:.3f} ms -> {new:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,74 @@
 import pygame
+from constants import GIVEN_COLOR, ENTERED_COLOR, SKETCH_COLOR, CONFLICT_COLOR
+from game_state import CellState
+from glyph_cache import glyphs, value_symbol, mark_font_size
+from metrics import metrics
 
 
-class Cell:
-    def __init__(self, value, row, col, screen, width, height):
-        self.value = value
-        self.row= row
-        self.col = col
-        self.screen = screen
-        self.sketched_value = 0
+class Cell(CellState):
+    # A drawable view of cell index of a GameState. The values themselves live in the state,
+    # and the screen and cell size, which every cell shares, live on the board
+    __slots__ = ('board', 'dirty', '_selected', '_conflict')
+
+    def __init__(self, state, index, board):
+        super().__init__(state, index)
+        self.board = board
+        self.reset()
+
+    # Start over for a new game on the same state (see Board)
+    def reset(self):
+        # True when the cell changed since it was last drawn (see Board.draw_dirty)
+        self.dirty = True
         self.selected = False
-        self.width = width
-        self.height = height
-        self.is_initial = value != 0
+        self.conflict = False
+
+
+    #value, sketched_value, marks, conflict and selected mark the cell dirty whenever they change
+    @property
+    def value(self):
+        return self.state.values[self.index]
+
+    @value.setter
+    def value(self, value):
+        self.state.values[self.index] = value
+        self.dirty = True
+
+    @property
+    def sketched_value(self):
+        return self.state.sketches[self.index]
+
+    @sketched_value.setter
+    def sketched_value(self, value):
+        self.state.sketches[self.index] = value
+        self.dirty = True
+
+    @property
+    def marks(self):
+        return self.state.marks[self.index]
+
+    @marks.setter
+    def marks(self, marks):
+        self.state.marks[self.index] = marks
+        self.dirty = True
+
+    #True when the value is repeated in this cell's row, column or box (set by Board)
+    @property
+    def conflict(self):
+        return self._conflict
+
+    @conflict.setter
+    def conflict(self, conflict):
+        self._conflict = conflict
+        self.dirty = True
+
+    @property
+    def selected(self):
+        return self._selected
+
+    @selected.setter
+    def selected(self, selected):
+        self._selected = selected
+        self.dirty = True
 
 
     #Setter for this cell’s value
@@ -27,33 +84,62 @@ class Cell:
 
     ''' Draws this cell, along with the value inside it.
     If this cell has a nonzero value, that value is displayed.
-    Otherwise, no value is displayed in the cell.
+    Otherwise the sketched value is displayed, or else the pencil marks.
     The cell is outlined red if it is currently selected.'''
+    @metrics.timed("cell.draw")
     def draw(self):
-        font = pygame.font.Font(None, 40)
-        x = self.col*self.width
-        y = self.row*self.height
+        screen = self.board.screen
+        width = self.board.cell_width
+        height = self.board.cell_height
+        x = self.col*width
+        y = self.row*height
 
         if self.selected:
-            pygame.draw.rect(self.screen, (255,0,0), (x, y, self.width, self.height), 3)
+            pygame.draw.rect(screen, (255,0,0), (x, y, width, height), 3)
             
             
         if self.value != 0:
-            text = font.render(str(self.value), 1, (0,0,0))
-            self.screen.blit(text, (x + self.width//2 - text.get_width()//2,
-                                    y + self.height//2 - text.get_height()//2))
+            if self.conflict:
+                color = CONFLICT_COLOR
+            elif self.is_initial:
+                color = GIVEN_COLOR
+            else:
+                color = ENTERED_COLOR
+            text = glyphs.digit(self.value, color, height)
+            screen.blit(text, (x + width//2 - text.get_width()//2,
+                               y + height//2 - text.get_height()//2))
 
         elif self.sketched_value != 0:
-            x = self.col * self.width
-            y = self.row * self.height
-            pygame.draw.rect(self.screen, (255, 255, 255), (x+5, y+5, 50, 50), 0)
-            text = font.render(str(self.sketched_value), 1, (120,120,120))
-            self.screen.blit(text, (x+5, y+5))
+            pygame.draw.rect(screen, (255, 255, 255), (x+5, y+5, width*0.75, height*0.75), 0)
+            text = glyphs.digit(self.sketched_value, SKETCH_COLOR, height)
+            screen.blit(text, (x+5, y+5))
+
+        elif self.marks:
+            self.draw_marks(x, y)
+
+    def draw_marks(self, x, y):
+        # Mark v goes in row (v-1) // box_size, column (v-1) % box_size of a small grid inside the cell
+        board = self.board
+        box_size = board.box_size
+        mark_width = board.cell_width / box_size
+        mark_height = board.cell_height / box_size
+        size = mark_font_size(board.cell_height, box_size)
+        marks = self.marks
+        while marks:
+            bit = marks & -marks
+            marks ^= bit
+            value = bit.bit_length()
+            text = glyphs.text(value_symbol(value), size, SKETCH_COLOR)
+            row, col = divmod(value - 1, box_size)
+            board.screen.blit(text, (x + (col + 0.5) * mark_width - text.get_width() // 2,
+                                     y + (row + 0.5) * mark_height - text.get_height() // 2))
     
     def erase(self):
-        x = self.col * self.width
-        y = self.row * self.height
+        width = self.board.cell_width
+        height = self.board.cell_height
+        x = self.col * width
+        y = self.row * height
         
         self.selected = False
-        pygame.draw.rect(self.screen, (255, 255, 255), (x, y, self.width, self.height), 3)
+        pygame.draw.rect(self.board.screen, (255, 255, 255), (x, y, width, height), 3)
         
\ No newline at end of file
@@ -1,3 +1,50 @@
 HEIGHT = 800
 WIDTH = 600
-BG_COLOR = (255, 255, 255)
\ No newline at end of file
+BG_COLOR = (255, 255, 255)
+
+# Number of cells removed from the solution for each difficulty
+DIFFICULTY_CELLS = {"EASY": 30, "MEDIUM": 40, "HARD": 50}
+
+# Precomputed puzzles (see puzzle_bank.py). Board falls back to generating when it is missing
+PUZZLE_BANK_PATH = "puzzles.bank"
+
+# Board sizes (rows/columns) that can be picked from the main menu
+BOARD_SIZES = (9, 16, 25)
+
+# Colors of cell values: given by the puzzle, entered by the player, sketched,
+# and repeated in a row, column or box
+GIVEN_COLOR = (0, 0, 0)
+ENTERED_COLOR = (0, 0, 0)
+SKETCH_COLOR = (120, 120, 120)
+CONFLICT_COLOR = (200, 0, 0)
+
+# Remove a digit from the pencil marks of every cell that can see it when it is placed
+AUTO_ELIMINATE_MARKS = True
+
+# Seconds a hint may spend searching when the player has left the precomputed solve
+HINT_TIME_LIMIT = 0.05
+
+# Saved game, written while playing and picked up again on the next start
+SAVE_PATH = "sudoku.save"
+
+# Autosave after this many moves, or this many seconds after an unsaved move
+AUTOSAVE_MOVES = 5
+AUTOSAVE_SECONDS = 10
+
+# Number of moves that can be undone
+UNDO_LIMIT = 1000
+
+# Performance metrics (see metrics.py): collect from the start, recent samples kept per timing,
+# and the file they are written to when the game closes
+METRICS_ENABLED = False
+METRICS_SAMPLES = 1000
+METRICS_PATH = "metrics.json"
+
+# Puzzle service (see service.py): address, ready puzzles kept per difficulty,
+# and solutions checked per batch or seconds to wait for a batch to fill
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8036
+SERVICE_POOL_SIZE = 32
+VALIDATE_BATCH = 64
+VALIDATE_WAIT = 0.002
+SERVICE_POOL_WAIT = 5.0
\ No newline at end of file
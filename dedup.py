@@ -0,0 +1,223 @@
+'''
+Index of canonical puzzle forms for finding puzzles seen before in disguise
+
+Each puzzle is reduced to its canonical form (see symmetry.py), which is hashed
+to a 64-bit key. Keys live in an open-addressing hash table: a flat array of
+u64 slots where 0 means empty, doubled whenever it gets half full. The table is
+a bytearray in memory, or an mmap of a file so the index can outgrow memory and
+be kept between runs.
+
+File layout (little-endian):
+
+    header      magic b"SDKD", version (u16), unused (u16),
+                slot count (u64, a power of two), key count (u64)
+    slots       slot count u64 keys
+
+Two different puzzles share a key with probability 1 in 2**64 per pair, so an
+index of n puzzles reports about n**2 / 2**65 false duplicates on average: about
+0.03 at a billion puzzles, with even odds of a single one only near 5 billion.
+Callers need no collision handling below that.
+
+Measure the duplicates in a file of puzzles (one per line, as written by generate.py):
+    python3 dedup.py puzzles.txt
+    python3 dedup.py puzzles.txt --index seen.idx     # also remember them between runs
+'''
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+
+from symmetry import canonical_form
+
+MAGIC = b"SDKD"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQ")
+# The key count is the last header field
+COUNT = struct.Struct("<Q")
+COUNT_OFFSET = HEADER.size - COUNT.size
+SLOT = 8
+
+# Starting slot count; always a power of two
+MIN_SLOTS = 1 << 10
+
+
+def puzzle_key(grid):
+    '''
+    64-bit hash of grid's canonical form (never 0, which marks an empty slot)
+    '''
+    digest = hashlib.blake2b(canonical_form(grid).encode(), digest_size=SLOT).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class DedupIndex:
+    '''
+    Set of puzzle keys, in memory or backed by a file
+
+    Parameters:
+        path: index file, created if missing; None keeps the index in memory only
+        slots: starting slot count for a new index
+
+    Example:
+        with DedupIndex("seen.idx") as seen:
+            if seen.add(board):
+                ...  # never seen before, in any disguise
+    '''
+
+    def __init__(self, path=None, slots=MIN_SLOTS):
+        self.path = path
+        self.file = None
+        self.map = None
+        if path is not None and os.path.exists(path):
+            self.open_file()
+        else:
+            self.create(max(MIN_SLOTS, 1 << (slots - 1).bit_length()))
+
+    def create(self, slots):
+        size = HEADER.size + slots * SLOT
+        if self.path is None:
+            self.buffer = bytearray(size)
+            self.write_header(slots, 0)
+            self.load()
+        else:
+            with open(self.path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0, slots, 0))
+                f.truncate(size)
+            self.open_file()
+
+    def open_file(self):
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.buffer = self.map
+        magic, version, _, slots, count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a dedup index")
+        if version != VERSION:
+            raise ValueError(f"{self.path} is dedup index version {version}, expected {VERSION}")
+        self.load()
+
+    def load(self):
+        _, _, _, self.slots, self.count = HEADER.unpack_from(self.buffer, 0)
+        self.mask = self.slots - 1
+        self.keys = memoryview(self.buffer)[HEADER.size:].cast("Q")
+
+    def write_header(self, slots, count):
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, 0, slots, count)
+
+    def release(self):
+        # The memoryview must go before the mmap can be closed
+        self.keys.release()
+        if self.map is not None:
+            self.map.close()
+            self.file.close()
+            self.map = self.file = None
+
+    def close(self):
+        if self.keys is None:
+            return
+        if self.map is not None:
+            self.write_header(self.slots, self.count)
+            self.map.flush()
+        self.release()
+        self.keys = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def find(self, key):
+        # Slot holding key, or the empty slot where it would go
+        keys, mask = self.keys, self.mask
+        slot = key & mask
+        while keys[slot] and keys[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def contains_key(self, key):
+        return self.keys[self.find(key)] == key
+
+    def add_key(self, key):
+        '''
+        Add key; returns True if it was new, False if it was already there
+        '''
+        slot = self.find(key)
+        if self.keys[slot] == key:
+            return False
+        self.keys[slot] = key
+        self.count += 1
+        if self.map is not None:
+            # Keep the count on disk in step with the slots, so a file left by a crash
+            # never holds more keys than its header says (find relies on free slots)
+            COUNT.pack_into(self.buffer, COUNT_OFFSET, self.count)
+        if self.count * 2 > self.slots:
+            self.grow()
+        return True
+
+    def __contains__(self, grid):
+        return self.contains_key(puzzle_key(grid))
+
+    def add(self, grid):
+        '''
+        Remember grid; returns True if neither it nor any disguise of it was seen before
+        '''
+        return self.add_key(puzzle_key(grid))
+
+    def grow(self):
+        # Rehash into a table twice the size. On disk the new table is built next
+        # to the old one and swapped in, so a crash never leaves a half-written index
+        old_keys, old_map, old_file = self.keys, self.map, self.file
+        count = self.count
+        final = self.path
+        if final is not None:
+            self.path = final + ".tmp"
+        self.create(self.slots * 2)
+        self.path = final
+        for key in old_keys:
+            if key:
+                self.keys[self.find(key)] = key
+        self.count = count
+        self.write_header(self.slots, count)
+
+        old_keys.release()
+        if old_map is not None:
+            old_map.close()
+            old_file.close()
+            self.map.flush()
+            os.replace(final + ".tmp", final)
+
+
+def read_puzzles(path):
+    # Yield the puzzle on each line written by generate.py (line format) as a flat list
+    with open(path) as f:
+        for line in f:
+            text = line.split()[0] if line.strip() else ""
+            if len(text) == 81:
+                yield [int(ch) for ch in text]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count puzzles that are the same up to symmetry")
+    parser.add_argument("puzzles", help="file with one 81-character puzzle per line")
+    parser.add_argument("--index", help="index file to check against and add to (default: in memory only)")
+    args = parser.parse_args()
+
+    total = duplicates = 0
+    with DedupIndex(args.index) as seen:
+        for grid in read_puzzles(args.puzzles):
+            total += 1
+            if not seen.add(grid):
+                duplicates += 1
+        size = len(seen)
+    share = duplicates / total * 100 if total else 0.0
+    print(f"{total} puzzles, {total - duplicates} unique, {duplicates} duplicates ({share:.2f}%)")
+    print(f"index holds {size} puzzles")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+'''
+Compact game state that works without pygame
+
+A game in progress is kept in flat buffers indexed by row * size + col rather
+than one object per cell:
+
+    values      bytearray   current value of every cell, 0 when empty
+    givens      bytearray   1 for cells given by the puzzle
+    sketches    bytearray   sketched value, 0 for none
+    marks       array('L')  pencil marks, bit v-1 set when v is marked
+    solution    bytearray   the solved grid
+
+plus the counters behind is_full, is_solved, conflicts and hints. load() fills
+the same buffers again for the next puzzle, and the CellState views returned by
+cell(row, col) are created once per board size and reused between games. Board
+builds its pygame Cells as the same kind of view.
+
+Example:
+    state = GameState(9).load(board, solution)
+    state.set_value(state.index(0, 2), 4)
+    state.is_full(), state.conflicts(), state.hint()
+'''
+
+import functools
+import math
+from array import array
+
+from grader import TECHNIQUES, Step, grade, layout, next_step
+
+# Trace techniques are stored as their position in this tuple; NO_TECHNIQUE is None
+TECHNIQUE_NAMES = tuple(TECHNIQUES)
+NO_TECHNIQUE = 255
+
+
+@functools.lru_cache(maxsize=None)
+def unit_tables(n):
+    '''
+    Precomputed unit tables for an n x n board
+
+    Units are numbered rows first (0..n-1), then columns, then boxes.
+
+    Returns:
+        (units_of, unit_cells, peers) where units_of[i] is the (row, column, box)
+        unit numbers of cell i, unit_cells[u] the cells of unit u and peers[i]
+        every other cell sharing a unit with cell i
+    '''
+    rows, cols, boxes, peers = layout(n)
+    box = math.isqrt(n)
+    units_of = tuple((i // n, n + i % n, 2 * n + i // n // box * box + i % n // box) for i in range(n * n))
+    return units_of, rows + cols + boxes, peers
+
+
+class CellState:
+    '''
+    View of one cell of a GameState; holds nothing but the state and the index
+    Values written through a view skip the state's counters, so moves should use
+    GameState.set_value.
+    '''
+    __slots__ = ('state', 'index', 'row', 'col')
+
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+        self.row, self.col = divmod(index, state.size)
+
+    @property
+    def value(self):
+        return self.state.values[self.index]
+
+    @value.setter
+    def value(self, value):
+        self.state.values[self.index] = value
+
+    @property
+    def sketched_value(self):
+        return self.state.sketches[self.index]
+
+    @sketched_value.setter
+    def sketched_value(self, value):
+        self.state.sketches[self.index] = value
+
+    @property
+    def marks(self):
+        return self.state.marks[self.index]
+
+    @marks.setter
+    def marks(self, marks):
+        self.state.marks[self.index] = marks
+
+    @property
+    def is_initial(self):
+        return self.state.givens[self.index] == 1
+
+    @property
+    def solution(self):
+        return self.state.solution[self.index]
+
+
+class GameState:
+    '''
+    Parameters:
+        size: number of rows/columns, a perfect square (9, 16, 25, ...)
+    '''
+    __slots__ = ('size', 'box_size', 'values', 'givens', 'sketches', 'marks', 'solution',
+                 'counts', 'clashes', 'wrong', 'filled', 'views',
+                 'trace_cells', 'trace_digits', 'trace_techniques', 'trace_position', 'next_hint')
+
+    def __init__(self, size=9):
+        self.allocate(size)
+
+    def allocate(self, size):
+        # (Re)create every buffer for a size x size board, all empty
+        self.size = size
+        self.box_size = math.isqrt(size)
+        cells = size * size
+        self.values = bytearray(cells)
+        self.givens = bytearray(cells)
+        self.sketches = bytearray(cells)
+        self.marks = array('L', [0]) * cells
+        self.solution = bytearray(cells)
+        # counts[unit * (size + 1) + value] is how many cells of the unit hold value
+        self.counts = bytearray(3 * size * (size + 1))
+        self.trace_position = array('h', [-1]) * cells
+        # CellState views, made on first use since headless callers may never need them
+        self.views = None
+        self.clashes = set()
+        self.wrong = set()
+        self.filled = 0
+        self.load_trace(())
+
+    def load(self, board, solution, trace=None):
+        '''
+        Start a new game, reusing the buffers when the size has not changed
+
+        Parameters:
+            board, solution: 2D lists as returned by generate_sudoku
+            trace: the grader's solve trace for board (worked out here when None)
+
+        Returns:
+            self
+        '''
+        if len(board) != self.size:
+            self.allocate(len(board))
+        n = self.size
+        self.values[:] = bytes(num for row in board for num in row)
+        self.givens[:] = bytes(num != 0 for row in board for num in row)
+        self.solution[:] = bytes(num for row in solution for num in row)
+        self.sketches[:] = bytes(n * n)
+        self.marks[:] = array('L', [0]) * (n * n)
+        self.recount()
+
+        if trace is None:
+            trace = grade(board).trace
+        self.load_trace(trace)
+        return self
+
+    def recount(self):
+        # Rebuild the counters from values and solution
+        self.counts[:] = bytes(len(self.counts))
+        self.clashes = set()
+        self.wrong = set()
+        self.filled = 0
+        for i, num in enumerate(self.values):
+            if num:
+                self.count(i, num, 1)
+                self.filled += 1
+                if num != self.solution[i]:
+                    self.wrong.add(i)
+
+    def load_trace(self, trace):
+        techniques = bytes(NO_TECHNIQUE if step.technique is None else TECHNIQUE_NAMES.index(step.technique)
+                           for step in trace)
+        self.set_trace(array('H', (step.cell for step in trace)), bytes(step.digit for step in trace), techniques)
+
+    def set_trace(self, cells, digits, techniques, next_hint=0):
+        # Take a trace already packed the way it is stored (see load_trace)
+        self.trace_cells = cells
+        self.trace_digits = digits
+        self.trace_techniques = techniques
+        # Flat cell index -> position of its step in the trace, -1 if it has none
+        self.trace_position[:] = array('h', [-1]) * len(self.trace_position)
+        for k, i in enumerate(self.trace_cells):
+            self.trace_position[i] = k
+        # Every trace step before next_hint is filled in
+        self.next_hint = next_hint
+
+    ##### CELLS #####
+
+    def index(self, row, col):
+        return row * self.size + col
+
+    def cell(self, row, col):
+        if self.views is None:
+            self.views = [CellState(self, i) for i in range(self.size * self.size)]
+        return self.views[row * self.size + col]
+
+    def grid(self, buffer=None):
+        # buffer as a 2D list (values by default)
+        if buffer is None:
+            buffer = self.values
+        n = self.size
+        return [list(buffer[r * n:(r + 1) * n]) for r in range(n)]
+
+    def puzzle(self):
+        # The puzzle as given, as a 2D list
+        n = self.size
+        return [[self.values[i] if self.givens[i] else 0 for i in range(r * n, (r + 1) * n)] for r in range(n)]
+
+    ##### MOVES #####
+
+    def count(self, i, value, delta):
+        stride = self.size + 1
+        for unit in unit_tables(self.size)[0][i]:
+            slot = unit * stride + value
+            self.counts[slot] += delta
+            if self.counts[slot] > 1:
+                self.clashes.add((unit, value))
+            else:
+                self.clashes.discard((unit, value))
+
+    def set_value(self, i, value, eliminate=False):
+        '''
+        Change the value of cell i and update the counters
+        Every move should go through here.
+
+        Parameters:
+            eliminate: also remove value from the pencil marks of the cell's peers
+
+        Returns:
+            list of the cells that changed: i first, then any peers that lost a mark
+        '''
+        old = self.values[i]
+        if old == value:
+            return []
+        if old != 0:
+            self.count(i, old, -1)
+            self.filled -= 1
+        if value != 0:
+            self.count(i, value, 1)
+            self.filled += 1
+        if value != 0 and value != self.solution[i]:
+            self.wrong.add(i)
+        else:
+            self.wrong.discard(i)
+        if value == 0:
+            # Clearing a cell the hints already went past moves them back to it
+            position = self.trace_position[i]
+            if 0 <= position < self.next_hint:
+                self.next_hint = position
+        self.values[i] = value
+
+        changed = [i]
+        if value != 0 and eliminate:
+            changed.extend(self.eliminate_mark(i, value))
+        return changed
+
+    def eliminate_mark(self, i, value):
+        # Remove value from the pencil marks of every peer of cell i; returns the peers changed
+        bit = 1 << (value - 1)
+        changed = []
+        for p in unit_tables(self.size)[2][i]:
+            if self.marks[p] & bit:
+                self.marks[p] &= ~bit
+                changed.append(p)
+        return changed
+
+    def fill_marks(self):
+        '''
+        Mark every possible value in every empty cell
+        A value is possible when no cell in the same row, column or box holds it.
+        '''
+        n = self.size
+        stride = n + 1
+        used = [0] * (3 * n)
+        for unit in range(3 * n):
+            for value in range(1, n + 1):
+                if self.counts[unit * stride + value]:
+                    used[unit] |= 1 << (value - 1)
+        all_values = (1 << n) - 1
+        units_of = unit_tables(n)[0]
+        for i in range(n * n):
+            if self.values[i] == 0:
+                r, c, b = units_of[i]
+                self.marks[i] = all_values & ~(used[r] | used[c] | used[b])
+
+    def reset(self):
+        # Clear every value, sketch and mark the player entered
+        for i in range(self.size * self.size):
+            if not self.givens[i]:
+                self.set_value(i, 0)
+                self.sketches[i] = 0
+                self.marks[i] = 0
+
+    ##### CHECKS #####
+
+    def is_full(self):
+        return self.filled == self.size * self.size
+
+    def is_solved(self):
+        # Any full grid that follows the rules wins, even if it differs from solution.
+        # The givens never change, so no repeated value in any unit is all that is needed
+        return self.is_full() and not self.clashes
+
+    def conflicts(self):
+        # Returns the index of every cell whose value is repeated in one of its units
+        unit_cells = unit_tables(self.size)[1]
+        cells = set()
+        for unit, value in self.clashes:
+            for i in unit_cells[unit]:
+                if self.values[i] == value:
+                    cells.add(i)
+        return cells
+
+    def find_empty(self):
+        # Index of the first empty cell, or None
+        index = self.values.find(0)
+        return None if index < 0 else index
+
+    ##### HINTS #####
+
+    def hint(self, time_limit=None):
+        '''
+        Returns the next useful step as a grader Step(cell, digit, technique), or None if the board is full
+        cell is a flat index (row * size + col).
+
+        A value that does not match the solution is pointed out first, with technique "wrong value".
+        Otherwise the next step of the stored trace whose cell is still empty is given, which
+        is O(1) on average since next_hint only moves back when a cell is cleared. Once the trace
+        runs out (the grader could not finish the puzzle) the current board is searched for up to
+        time_limit seconds, and if that finds nothing the solution of an empty cell is given with
+        technique None.
+        '''
+        if self.wrong:
+            i = next(iter(self.wrong))
+            return Step(i, self.solution[i], "wrong value")
+
+        while self.next_hint < len(self.trace_cells):
+            k = self.next_hint
+            i = self.trace_cells[k]
+            if self.values[i] == 0:
+                technique = self.trace_techniques[k]
+                return Step(i, self.trace_digits[k], None if technique == NO_TECHNIQUE else TECHNIQUE_NAMES[technique])
+            self.next_hint += 1
+
+        if self.is_full():
+            return None
+        step = next_step(self.grid(), time_limit)
+        if step is not None:
+            return step
+        i = self.find_empty()
+        return Step(i, self.solution[i], None)
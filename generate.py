@@ -0,0 +1,111 @@
+'''
+Command-line puzzle generator that does not need pygame
+
+Puzzles are written out as soon as they are generated, so any number of them
+can be streamed into a file or another program without holding them in memory.
+
+Formats:
+    line     one puzzle per line, 81 characters, 0 for empty cells
+             (with --solutions the solution follows after a space)
+    jsonl    one JSON object per line with index, id, difficulty, seed, puzzle and solution
+             (id regenerates the puzzle, see puzzle_id.py)
+    binary   fixed-size records of puzzle then solution, two cells per byte,
+             the same records a puzzle bank stores (see puzzle_bank.py)
+
+Run with:
+    python3 generate.py --count 1000 --difficulty HARD
+    python3 generate.py --count 1000000 --format binary --workers 8 -o hard.bin
+    python3 generate.py --count 100 --format jsonl | gzip > puzzles.jsonl.gz
+'''
+
+import argparse
+import json
+import os
+import sys
+
+from batch import generate_batch, item_seed
+from constants import DIFFICULTY_CELLS
+from puzzle_bank import pack_record
+from puzzle_id import make_puzzle_id
+
+FORMATS = ("line", "jsonl", "binary")
+
+
+def grid_string(grid):
+    # 2D list -> "530070000..." (9x9 boards only, so every value is one digit)
+    return "".join(str(num) for row in grid for num in row)
+
+
+def format_line(index, board, solution, args):
+    if args.solutions:
+        return f"{grid_string(board)} {grid_string(solution)}\n".encode()
+    return f"{grid_string(board)}\n".encode()
+
+
+def format_jsonl(index, board, solution, args):
+    record = {
+        "index": index,
+        "id": make_puzzle_id(item_seed(args.seed, index), args.difficulty),
+        "difficulty": args.difficulty,
+        "seed": args.seed,
+        "puzzle": grid_string(board),
+        "solution": grid_string(solution),
+    }
+    return (json.dumps(record) + "\n").encode()
+
+
+def format_binary(index, board, solution, args):
+    return pack_record(board, solution)
+
+
+FORMATTERS = {"line": format_line, "jsonl": format_jsonl, "binary": format_binary}
+
+
+def write_puzzles(out, args):
+    '''
+    Generate args.count puzzles and write each one to the binary stream out as it arrives
+    '''
+    formatter = FORMATTERS[args.format]
+    puzzles = generate_batch(args.count, DIFFICULTY_CELLS[args.difficulty], seed=args.seed,
+                             workers=args.workers, ordered=not args.unordered)
+    for index, board, solution in puzzles:
+        out.write(formatter(index, board, solution, args))
+
+
+def seed_value(text):
+    # argparse type for --seed: puzzle IDs only hold non-negative seeds
+    seed = int(text)
+    if seed < 0:
+        raise argparse.ArgumentTypeError("seed must not be negative")
+    return seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate 9x9 puzzles without starting the game")
+    parser.add_argument("--count", type=int, default=1, help="number of puzzles")
+    parser.add_argument("--difficulty", choices=list(DIFFICULTY_CELLS), default="MEDIUM")
+    parser.add_argument("--seed", type=seed_value, default=0, help="the same seed always gives the same puzzles")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--format", choices=FORMATS, default="line")
+    parser.add_argument("--solutions", action="store_true", help="add the solution to each line (line format)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="write puzzles as they finish instead of in index order (faster with many workers)")
+    parser.add_argument("-o", "--output", help="file to write to (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        if args.output:
+            with open(args.output, "wb") as out:
+                write_puzzles(out, args)
+        else:
+            write_puzzles(sys.stdout.buffer, args)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head). Point stdout at devnull so
+        # Python does not complain again while flushing it on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+'''
+Shared cache of fonts and rendered text
+
+Creating a pygame Font loads the font file, and rendering text builds a new
+surface, so doing either on every frame is slow. Everything here is created
+once and reused:
+
+    glyphs.font(size)                       -> cached pygame Font
+    glyphs.text(text, size, color)          -> cached rendered surface
+    glyphs.digit(value, color, cell_height) -> pre-rendered cell value for the current cell size
+
+Surfaces returned by the cache are shared, so they must not be drawn on.
+'''
+
+import pygame
+
+
+#Text shown for a value: 1-9 as digits, then A, B, C, ... for 10 and up (16x16 and 25x25 boards)
+def value_symbol(value):
+    if value < 10:
+        return str(value)
+    return chr(ord('A') + value - 10)
+
+
+#Font size used for cell values: 40px on a 9x9 board, smaller on bigger boards
+def digit_font_size(cell_height):
+    return int(cell_height * 0.6)
+
+
+#Font size used for pencil marks, which sit in a box_size x box_size grid inside the cell
+def mark_font_size(cell_height, box_size):
+    return max(1, int(cell_height / box_size * 0.8))
+
+
+class GlyphCache:
+    def __init__(self):
+        self.fonts = {}
+        self.texts = {}
+
+        # (value, color) -> surface, valid only for digit_height
+        self.digits = {}
+        self.digit_height = None
+
+    def font(self, size, family=None):
+        key = (family, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pygame.font.Font(family, size)
+        return font
+
+    def text(self, text, size, color, family=None):
+        key = (text, size, tuple(color), family)
+        img = self.texts.get(key)
+        if img is None:
+            img = self.texts[key] = self.font(size, family).render(text, True, color)
+        return img
+
+    def digit(self, value, color, cell_height):
+        '''
+        Return the surface for a cell value drawn at the size used for cells cell_height tall
+        All digits are dropped and re-rendered when the cell size changes.
+        '''
+        if cell_height != self.digit_height:
+            self.digits.clear()
+            self.digit_height = cell_height
+        key = (value, tuple(color))
+        img = self.digits.get(key)
+        if img is None:
+            img = self.digits[key] = self.text(value_symbol(value), digit_font_size(cell_height), color)
+        return img
+
+    def prerender_digits(self, cell_height, max_value, colors):
+        # Render every value in every color up front so the first frame does not have to
+        for color in colors:
+            for value in range(1, max_value + 1):
+                self.digit(value, color, cell_height)
+
+    def invalidate(self):
+        # Drop every cached surface (fonts are kept since they do not depend on the screen)
+        self.texts.clear()
+        self.digits.clear()
+        self.digit_height = None
+
+
+# Shared by every Cell, Menu and Button
+glyphs = GlyphCache()
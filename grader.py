@@ -0,0 +1,404 @@
+'''
+Rates puzzles by the human solving techniques they need
+
+The grader solves a puzzle the way a person would, always using the easiest
+technique that makes progress, and reports the hardest technique it needed.
+Each technique has a weight (roughly on the Sudoku Explainer scale) and the
+score of a puzzle is the weight of its hardest technique.
+
+    grade(board)            -> Grade(solved, hardest, score, trace)
+    next_step(board)        -> the easiest next placement for a partly filled board
+    grade_batch(boards)     -> grades for many puzzles, spread over worker processes
+    difficulty_for(score)   -> "EASY", "MEDIUM" or "HARD"
+'''
+
+import functools
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+# Technique name -> weight, easiest first
+TECHNIQUES = {
+    "hidden single": 1.5,
+    "naked single": 2.3,
+    "pointing": 2.6,
+    "claiming": 2.8,
+    "naked pair": 3.0,
+    "x-wing": 3.2,
+    "hidden pair": 3.4,
+    "naked triple": 3.6,
+    "swordfish": 3.8,
+    "hidden triple": 4.0,
+    "xy-wing": 4.2,
+}
+
+# Score of a puzzle that the techniques above cannot finish
+UNSOLVED_SCORE = 10.0
+
+# Highest score for each difficulty bucket, checked in order
+GRADE_THRESHOLDS = (("EASY", 2.3), ("MEDIUM", 3.4), ("HARD", UNSOLVED_SCORE))
+
+# One placement in a solve: flat cell index (row * size + col), digit and the
+# hardest technique used since the previous placement
+Step = namedtuple("Step", ["cell", "digit", "technique"])
+
+Grade = namedtuple("Grade", ["solved", "hardest", "score", "trace"])
+
+
+class Contradiction(Exception):
+    '''
+    Raised when the puzzle's givens leave some cell or unit with no possibility
+    '''
+
+
+@functools.lru_cache(maxsize=None)
+def layout(n):
+    '''
+    Precomputed index tables for an n x n board
+
+    Returns:
+        (rows, cols, boxes, peers) where rows/cols/boxes are tuples of units
+        (each a tuple of flat cell indexes) and peers[i] lists every cell sharing
+        a unit with cell i
+    '''
+    box = math.isqrt(n)
+    rows = tuple(tuple(r * n + c for c in range(n)) for r in range(n))
+    cols = tuple(tuple(r * n + c for r in range(n)) for c in range(n))
+    boxes = tuple(tuple((b // box * box + i // box) * n + b % box * box + i % box for i in range(n))
+                  for b in range(n))
+    peers = []
+    for i in range(n * n):
+        r, c = divmod(i, n)
+        b = r // box * box + c // box
+        peers.append(tuple(sorted(set(rows[r] + cols[c] + boxes[b]) - {i})))
+    return rows, cols, boxes, tuple(peers)
+
+
+def bits_of(mask):
+    # Digits whose bits are set in mask, smallest first
+    digits = []
+    while mask:
+        low = mask & -mask
+        digits.append(low.bit_length())
+        mask ^= low
+    return digits
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+class LogicalSolver:
+    '''
+    Candidate-bitmask solver that only uses the techniques in TECHNIQUES
+
+    Parameters:
+        board: 2D list of ints, 0 for empty cells
+    '''
+
+    def __init__(self, board):
+        self.n = len(board)
+        self.rows, self.cols, self.boxes, self.peers = layout(self.n)
+        self.units = self.rows + self.cols + self.boxes
+        self.values = [num for row in board for num in row]
+        self.cand = [0] * (self.n * self.n)
+        self.trace = []
+        self.hardest = None
+        # Hardest technique used since the last placement
+        self.pending = None
+
+        full = (1 << self.n) - 1
+        for i, num in enumerate(self.values):
+            if num == 0:
+                used = 0
+                for p in self.peers[i]:
+                    if self.values[p]:
+                        used |= 1 << (self.values[p] - 1)
+                self.cand[i] = full & ~used
+                if self.cand[i] == 0:
+                    raise Contradiction(f"cell {i} has no candidates")
+
+        self.steps = (
+            ("hidden single", self.hidden_single),
+            ("naked single", self.naked_single),
+            ("pointing", self.pointing),
+            ("claiming", self.claiming),
+            ("naked pair", lambda: self.naked_subset(2)),
+            ("x-wing", lambda: self.fish(2)),
+            ("hidden pair", lambda: self.hidden_subset(2)),
+            ("naked triple", lambda: self.naked_subset(3)),
+            ("swordfish", lambda: self.fish(3)),
+            ("hidden triple", lambda: self.hidden_subset(3)),
+            ("xy-wing", self.xy_wing),
+        )
+
+    def use(self, technique):
+        # Remember technique as the hardest one so far if it is
+        if self.hardest is None or TECHNIQUES[technique] > TECHNIQUES[self.hardest]:
+            self.hardest = technique
+        if self.pending is None or TECHNIQUES[technique] > TECHNIQUES[self.pending]:
+            self.pending = technique
+
+    def place(self, i, digit, technique):
+        self.use(technique)
+        self.values[i] = digit
+        self.cand[i] = 0
+        bit = ~(1 << (digit - 1))
+        for p in self.peers[i]:
+            self.cand[p] &= bit
+        self.trace.append(Step(i, digit, self.pending))
+        self.pending = None
+
+    def eliminate(self, cells, mask):
+        # Remove mask from every cell in cells; return True if anything changed
+        changed = False
+        for i in cells:
+            if self.cand[i] & mask:
+                self.cand[i] &= ~mask
+                changed = True
+                if self.cand[i] == 0:
+                    raise Contradiction(f"cell {i} has no candidates")
+        return changed
+
+    def solve(self):
+        '''
+        Apply techniques until the board is full or nothing works
+
+        Returns:
+            True if the board was completed
+        '''
+        while 0 in self.values:
+            if not self.step():
+                return False
+        return True
+
+    def step(self):
+        # Apply the easiest technique that makes progress; return False if none does
+        for name, technique in self.steps:
+            if technique():
+                self.use(name)
+                return True
+        return False
+
+    ##### TECHNIQUES #####
+    # Each returns True if it placed a value or removed a candidate
+
+    def naked_single(self):
+        found = False
+        for i, mask in enumerate(self.cand):
+            if mask and mask & (mask - 1) == 0:
+                self.place(i, mask.bit_length(), "naked single")
+                found = True
+        return found
+
+    def hidden_single(self):
+        found = False
+        for unit in self.units:
+            once = twice = 0
+            for i in unit:
+                twice |= once & self.cand[i]
+                once |= self.cand[i]
+            only = once & ~twice
+            while only:
+                bit = only & -only
+                only ^= bit
+                for i in unit:
+                    if self.cand[i] & bit:
+                        self.place(i, bit.bit_length(), "hidden single")
+                        found = True
+                        break
+        return found
+
+    def pointing(self):
+        # A digit confined to one row or column of a box is removed from the rest of that line
+        for b, cells in enumerate(self.boxes):
+            for digit in bits_of(self.unit_mask(cells)):
+                bit = 1 << (digit - 1)
+                where = [i for i in cells if self.cand[i] & bit]
+                line_rows = {i // self.n for i in where}
+                line_cols = {i % self.n for i in where}
+                if len(line_rows) == 1:
+                    line = self.rows[line_rows.pop()]
+                elif len(line_cols) == 1:
+                    line = self.cols[line_cols.pop()]
+                else:
+                    continue
+                outside = [i for i in line if i not in cells]
+                if self.eliminate(outside, bit):
+                    return True
+        return False
+
+    def claiming(self):
+        # A digit confined to one box within a row or column is removed from the rest of that box
+        box = math.isqrt(self.n)
+        for line in self.rows + self.cols:
+            for digit in bits_of(self.unit_mask(line)):
+                bit = 1 << (digit - 1)
+                where = [i for i in line if self.cand[i] & bit]
+                in_boxes = {(i // self.n) // box * box + (i % self.n) // box for i in where}
+                if len(in_boxes) != 1:
+                    continue
+                outside = [i for i in self.boxes[in_boxes.pop()] if i not in line]
+                if self.eliminate(outside, bit):
+                    return True
+        return False
+
+    def naked_subset(self, size):
+        # size cells of a unit sharing exactly size candidates keep them from the rest of the unit
+        for unit in self.units:
+            open_cells = [i for i in unit if self.cand[i] and popcount(self.cand[i]) <= size]
+            for group in itertools.combinations(open_cells, size):
+                mask = 0
+                for i in group:
+                    mask |= self.cand[i]
+                if popcount(mask) != size:
+                    continue
+                if self.eliminate([i for i in unit if i not in group], mask):
+                    return True
+        return False
+
+    def hidden_subset(self, size):
+        # size digits confined to the same size cells of a unit clear every other candidate there
+        for unit in self.units:
+            places = {}
+            for digit in bits_of(self.unit_mask(unit)):
+                bit = 1 << (digit - 1)
+                cells = frozenset(i for i in unit if self.cand[i] & bit)
+                if len(cells) <= size:
+                    places[digit] = cells
+            for digits in itertools.combinations(places, size):
+                cells = frozenset().union(*(places[d] for d in digits))
+                if len(cells) != size:
+                    continue
+                keep = 0
+                for d in digits:
+                    keep |= 1 << (d - 1)
+                changed = False
+                for i in cells:
+                    if self.cand[i] & ~keep:
+                        self.cand[i] &= keep
+                        changed = True
+                if changed:
+                    return True
+        return False
+
+    def fish(self, size):
+        # X-Wing (size 2) and Swordfish (size 3) on rows, then on columns
+        for lines, cross in ((self.rows, self.cols), (self.cols, self.rows)):
+            for digit in range(1, self.n + 1):
+                bit = 1 << (digit - 1)
+                spots = {}
+                for index, line in enumerate(lines):
+                    where = frozenset(k for k, i in enumerate(line) if self.cand[i] & bit)
+                    if 2 <= len(where) <= size:
+                        spots[index] = where
+                for chosen in itertools.combinations(spots, size):
+                    covered = frozenset().union(*(spots[index] for index in chosen))
+                    if len(covered) != size:
+                        continue
+                    targets = [cross[k][index] for k in covered for index in range(self.n) if index not in chosen]
+                    if self.eliminate(targets, bit):
+                        return True
+        return False
+
+    def xy_wing(self):
+        # Pivot XY with pincers XZ and YZ: Z goes from every cell that sees both pincers
+        pairs = [i for i, mask in enumerate(self.cand) if popcount(mask) == 2]
+        for pivot in pairs:
+            x_bit, y_bit = [1 << (d - 1) for d in bits_of(self.cand[pivot])]
+            wings = [p for p in self.peers[pivot] if popcount(self.cand[p]) == 2]
+            for a, b in itertools.combinations(wings, 2):
+                ma, mb = self.cand[a], self.cand[b]
+                z = ma & mb
+                if popcount(z) != 1 or z & (x_bit | y_bit):
+                    continue
+                if {ma ^ z, mb ^ z} != {x_bit, y_bit}:
+                    continue
+                seen = set(self.peers[a]) & set(self.peers[b])
+                seen.discard(pivot)
+                if self.eliminate(seen, z):
+                    return True
+        return False
+
+    def unit_mask(self, cells):
+        mask = 0
+        for i in cells:
+            mask |= self.cand[i]
+        return mask
+
+
+def grade(board):
+    '''
+    Rate one puzzle
+
+    Returns:
+        Grade(solved, hardest, score, trace)
+        solved is False when the techniques are not enough; score is then UNSOLVED_SCORE.
+        trace is the list of Steps taken, which can be replayed as hints.
+    '''
+    try:
+        logic = LogicalSolver(board)
+        solved = logic.solve()
+    except Contradiction:
+        return Grade(False, None, UNSOLVED_SCORE, [])
+    if not solved:
+        return Grade(False, logic.hardest, UNSOLVED_SCORE, logic.trace)
+    score = TECHNIQUES[logic.hardest] if logic.hardest else 0.0
+    return Grade(True, logic.hardest, score, logic.trace)
+
+
+def next_step(board, time_limit=None):
+    '''
+    Find the next placement a person could make on a partly filled board
+
+    Parameters:
+        board: 2D list of ints, 0 for empty cells
+        time_limit: seconds to spend before giving up (None for no limit)
+
+    Returns:
+        the first Step of a solve from board, or None if the board is full, breaks
+        a rule, needs techniques beyond TECHNIQUES or time ran out
+    '''
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    try:
+        logic = LogicalSolver(board)
+        while 0 in logic.values and not logic.trace:
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            if not logic.step():
+                return None
+    except Contradiction:
+        return None
+    return logic.trace[0] if logic.trace else None
+
+
+def difficulty_for(score):
+    '''
+    Map a score from grade to a difficulty name
+    '''
+    for name, highest in GRADE_THRESHOLDS:
+        if score <= highest:
+            return name
+    return GRADE_THRESHOLDS[-1][0]
+
+
+def grade_batch(boards, workers=None, chunksize=64):
+    '''
+    Grade many puzzles, yielding Grades in the same order as boards
+
+    Parameters:
+        boards: iterable of 2D lists
+        workers: number of worker processes (default: one per CPU). 1 runs in this process
+        chunksize: number of puzzles handed to a worker at a time
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for board in boards:
+            yield grade(board)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(grade, boards, chunksize)
@@ -0,0 +1,192 @@
+'''
+Undo and redo as a log of small changes
+
+Every change to a cell is recorded as a delta (cell index, kind, old, new)
+where kind says which buffer of the GameState changed: the value, the sketched
+value or the pencil marks. Deltas that belong to one move (a value and the
+marks it removed from its peers, a whole reset, ...) are kept together as a
+group, packed three numbers per delta into an array('L'):
+
+    index << 2 | kind, old, new
+
+so a move costs a few bytes instead of a copy of the board. Undo and redo pop
+one group and write its old or new values back. Only the last `limit` groups
+are kept, so memory stays bounded however long a game goes on. A group that
+falls out of the log is written into a copy of the board it started from
+(the base), so replay can still rebuild every position the log covers.
+
+Example:
+    history = History(state=state)
+    with history.group():
+        history.record(i, VALUE, 0, 5)
+        history.record(peer, MARKS, 0b10011, 0b00011)
+    apply(state, history.undo(), forward=False)
+'''
+
+import contextlib
+from array import array
+from collections import deque
+
+from constants import UNDO_LIMIT
+
+# Kinds of change
+VALUE = 0
+SKETCH = 1
+MARKS = 2
+KINDS = ("value", "sketch", "marks")
+
+
+def deltas(group):
+    # Yield (index, kind, old, new) for every change in a group, in the order they were made
+    for k in range(0, len(group), 3):
+        yield group[k] >> 2, group[k] & 3, group[k + 1], group[k + 2]
+
+
+def apply(state, group, forward=True):
+    '''
+    Write a group's new values (forward) or old values (undo) into a GameState
+
+    Values go through GameState.set_value so its counters stay right.
+
+    Returns:
+        list of the cells that changed
+    '''
+    changes = list(deltas(group))
+    if not forward:
+        changes.reverse()
+    changed = []
+    for index, kind, old, new in changes:
+        value = new if forward else old
+        if kind == VALUE:
+            state.set_value(index, value)
+        elif kind == SKETCH:
+            state.sketches[index] = value
+        else:
+            state.marks[index] = value
+        changed.append(index)
+    return changed
+
+
+class History:
+    '''
+    Bounded undo/redo log
+
+    Parameters:
+        limit: number of moves kept for undo; older ones are dropped
+        state: GameState the log starts from, copied as the base for replay
+            (without one, replay starts from the puzzle and only works until a move is dropped)
+    '''
+
+    def __init__(self, limit=UNDO_LIMIT, state=None):
+        self.done = deque(maxlen=limit)
+        self.undone = []
+        # Group being filled while inside group(), and how deeply group() is nested
+        self.open = None
+        self.depth = 0
+        # Moves pushed out of the log by limit
+        self.dropped = 0
+        # (values, sketches, marks) before the oldest kept move, indexed by kind
+        self.base = None
+        if state is not None:
+            self.set_base(state)
+
+    def set_base(self, state):
+        self.base = (bytearray(state.values), bytearray(state.sketches), array('L', state.marks))
+
+    def clear(self, state=None):
+        # Forget every move; state, if given, becomes the new base
+        self.done.clear()
+        self.undone = []
+        self.dropped = 0
+        if state is not None:
+            self.set_base(state)
+
+    def record(self, index, kind, old, new):
+        # Log one change; outside group() it is a move of its own
+        if old == new:
+            return
+        if self.open is not None:
+            self.open.extend((index << 2 | kind, old, new))
+        else:
+            self.push(array('L', (index << 2 | kind, old, new)))
+
+    @contextlib.contextmanager
+    def group(self):
+        # Everything recorded inside is undone and redone as one move
+        if self.depth == 0:
+            self.open = array('L')
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                group, self.open = self.open, None
+                if group:
+                    self.push(group)
+
+    def push(self, group):
+        if len(self.done) == self.done.maxlen:
+            # The oldest move is about to fall out: fold it into the base
+            self.dropped += 1
+            if self.base is not None:
+                for index, kind, old, new in deltas(self.done[0]):
+                    self.base[kind][index] = new
+        self.done.append(group)
+        # A new move replaces whatever was undone
+        self.undone = []
+
+    def can_undo(self):
+        return bool(self.done)
+
+    def can_redo(self):
+        return bool(self.undone)
+
+    def undo(self):
+        # Returns the group to apply backwards, or None if there is nothing to undo
+        if not self.done:
+            return None
+        group = self.done.pop()
+        self.undone.append(group)
+        return group
+
+    def redo(self):
+        # Returns the group to apply forwards, or None if there is nothing to redo
+        if not self.undone:
+            return None
+        group = self.undone.pop()
+        self.done.append(group)
+        return group
+
+    def __len__(self):
+        return len(self.done)
+
+    def moves(self):
+        # Yield every kept move, oldest first, as a list of (index, kind, old, new)
+        for group in self.done:
+            yield list(deltas(group))
+
+    def replay(self, state, count=None):
+        '''
+        Rebuild the board as it was after the first count kept moves (all of them by default)
+
+        state is set to the base first, so pass a separate GameState loaded with
+        the same puzzle to look at a past position without touching the game.
+
+        Raises:
+            ValueError if there is no base and the oldest moves were already dropped
+        '''
+        if self.base is None:
+            if self.dropped:
+                raise ValueError(f"the first {self.dropped} moves are no longer in the log")
+            state.reset()
+        else:
+            values, sketches, marks = self.base
+            for i, value in enumerate(values):
+                if not state.givens[i]:
+                    state.set_value(i, value)
+            state.sketches[:] = sketches
+            state.marks[:] = marks
+        for group in list(self.done)[:count]:
+            apply(state, group)
+        return state
@@ -1 +1 @@
-python3 sudoku.py
+python3 start.py
@@ -0,0 +1,191 @@
+'''
+Timing hooks and counters for seeing where time goes
+
+Hooks are left in the hot paths for good. They are off by default, and then
+each one only checks a flag:
+
+    with metrics.timer("board.draw"):       # time a block
+        ...
+
+    @metrics.timed("cell.draw")             # time every call of a function
+    def draw(self): ...
+
+    metrics.count("generate.backtracks", sudoku.backtracks)
+
+Turn them on with metrics.enable() (the game does when METRICS_ENABLED is set
+or the HUD is opened with F4). Every timing keeps its call count, total, last
+and max time, and its most recent samples for percentiles.
+
+Export what was collected for a bug report:
+    metrics.export("metrics.json")          # or "metrics.csv"
+'''
+
+import csv
+import io
+import json
+import time
+from collections import deque
+
+from constants import METRICS_SAMPLES
+
+CSV_FIELDS = ("name", "kind", "count", "total_ms", "mean_ms", "last_ms", "max_ms", "p50_ms", "p95_ms", "p99_ms")
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Timing:
+    __slots__ = ('count', 'total', 'last', 'max', 'recent')
+
+    def __init__(self, samples):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=samples)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        # Times in milliseconds; percentiles are over the recent samples only
+        recent = sorted(self.recent)
+        result = {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "last_ms": self.last * 1000,
+            "max_ms": self.max * 1000,
+        }
+        for pct in (50, 95, 99):
+            result[f"p{pct}_ms"] = percentile(recent, pct) * 1000 if recent else 0.0
+        return result
+
+
+class NullTimer:
+    # What timer() hands out while metrics are off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class BlockTimer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    '''
+    Named timings and counters
+
+    Parameters:
+        samples: recent samples kept per timing for percentiles
+    '''
+
+    def __init__(self, samples=METRICS_SAMPLES):
+        self.enabled = False
+        self.samples = samples
+        self.timings = {}
+        self.counters = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self.timings = {}
+        self.counters = {}
+
+    ##### HOOKS #####
+
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return BlockTimer(self, name)
+
+    def timed(self, name):
+        # Decorator timing every call of a function under name
+        def decorator(function):
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add_time(name, time.perf_counter() - start)
+            wrapper.__name__ = function.__name__
+            wrapper.__doc__ = function.__doc__
+            return wrapper
+        return decorator
+
+    def add_time(self, name, seconds):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = Timing(self.samples)
+        timing.add(seconds)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    ##### READING #####
+
+    def timing(self, name):
+        # Summary dict of one timing (see Timing.summary), or None if it never ran
+        timing = self.timings.get(name)
+        return timing.summary() if timing is not None else None
+
+    def summary(self):
+        return {
+            "timings": {name: timing.summary() for name, timing in sorted(self.timings.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def to_csv(self):
+        # One row per timing and per counter; a counter's value is in the count column
+        out = io.StringIO()
+        writer = csv.DictWriter(out, CSV_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        summary = self.summary()
+        for name, timing in summary["timings"].items():
+            writer.writerow(dict(timing, name=name, kind="timing"))
+        for name, value in summary["counters"].items():
+            writer.writerow({"name": name, "kind": "counter", "count": value})
+        return out.getvalue()
+
+    def export(self, path):
+        # Write everything collected so far; a path ending in .csv gets CSV, anything else JSON
+        text = self.to_csv() if path.lower().endswith(".csv") else self.to_json()
+        with open(path, "w", newline="") as f:
+            f.write(text)
+
+
+# Shared by every module
+metrics = Metrics()
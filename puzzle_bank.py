@@ -0,0 +1,213 @@
+'''
+On-disk bank of precomputed puzzles
+
+File layout (all integers little-endian):
+
+    header      magic b"SDKB", version (u16), board size (u16),
+                record size (u32), number of sections (u32)
+    sections    one entry per difficulty: name (8 bytes, NUL padded),
+                byte offset of its first record (u64), record count (u64)
+    records     fixed-size records, grouped by difficulty
+
+Each record is the puzzle followed by its solution, row by row, two cells per
+byte (high nibble first, padded with a zero nibble when the cell count is odd).
+Because records have a fixed size, record i of a section starts at
+offset + i * record_size and can be sliced straight out of the memory map.
+
+Build a bank with:
+    python3 puzzle_bank.py puzzles.bank --count 10000
+'''
+
+import argparse
+import mmap
+import os
+import random
+import struct
+
+from constants import DIFFICULTY_CELLS, PUZZLE_BANK_PATH
+from batch import generate_batch
+
+MAGIC = b"SDKB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+SECTION = struct.Struct("<8sQQ")
+
+# Split a packed byte into its two cell values
+NIBBLES = [(byte >> 4, byte & 0xF) for byte in range(256)]
+
+
+def record_size(size):
+    # Bytes needed for the puzzle plus the solution
+    return 2 * ((size * size + 1) // 2)
+
+
+def pack_grid(grid):
+    '''
+    Pack a 2D list of values 0..15 into bytes, two cells per byte
+    '''
+    cells = [num for row in grid for num in row]
+    if len(cells) % 2:
+        cells.append(0)
+    return bytes((cells[i] << 4) | cells[i + 1] for i in range(0, len(cells), 2))
+
+
+def unpack_grid(data, size):
+    '''
+    Inverse of pack_grid
+    '''
+    cells = []
+    for byte in data:
+        cells.extend(NIBBLES[byte])
+    return [cells[row * size:(row + 1) * size] for row in range(size)]
+
+
+def pack_record(board, solution):
+    return pack_grid(board) + pack_grid(solution)
+
+
+class PuzzleBank:
+    '''
+    Read-only view of a bank file through mmap
+
+    Opening a bank only reads the header; puzzles are decoded one record at a
+    time when requested.
+
+    Parameters:
+        path: bank file written by build_bank
+        rng: random.Random used by get (default: a new unseeded one)
+
+    Raises:
+        ValueError if path is not a bank, or is shorter than its header says (e.g. cut off)
+    '''
+
+    def __init__(self, path=PUZZLE_BANK_PATH, rng=None):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            self.file.close()
+            raise ValueError(f"{path} is empty, not a puzzle bank") from None
+        self.rng = rng or random.Random()
+        try:
+            self.read_header(path)
+        except ValueError:
+            self.close()
+            raise
+
+    def read_header(self, path):
+        if len(self.data) < HEADER.size:
+            raise ValueError(f"{path} is not a puzzle bank")
+        magic, version, self.size, self.record_size, sections = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a puzzle bank")
+        if version != VERSION:
+            raise ValueError(f"{path} has bank version {version}, expected {VERSION}")
+        if len(self.data) < HEADER.size + sections * SECTION.size:
+            raise ValueError(f"{path} is cut off in its section table")
+
+        # name -> (byte offset of first record, number of records)
+        self.sections = {}
+        for i in range(sections):
+            name, offset, count = SECTION.unpack_from(self.data, HEADER.size + i * SECTION.size)
+            name = name.rstrip(b"\0").decode("ascii")
+            # Every record the header promises must be in the file
+            if offset + count * self.record_size > len(self.data):
+                raise ValueError(f"{path} is cut off: {name} needs {offset + count * self.record_size} bytes, "
+                                 f"the file has {len(self.data)}")
+            self.sections[name] = (offset, count)
+
+    def count(self, difficulty):
+        return self.sections.get(difficulty, (0, 0))[1]
+
+    def record(self, difficulty, index):
+        '''
+        Return the (board, solution) pair stored at index for difficulty
+        '''
+        offset, count = self.sections[difficulty]
+        if not 0 <= index < count:
+            raise IndexError(f"{difficulty} has {count} puzzles, no index {index}")
+        start = offset + index * self.record_size
+        half = self.record_size // 2
+        board = unpack_grid(self.data[start:start + half], self.size)
+        solution = unpack_grid(self.data[start + half:start + self.record_size], self.size)
+        return board, solution
+
+    def get(self, difficulty, size=9):
+        '''
+        Return a random (board, solution) pair for difficulty, or None if the bank has none
+        (the bank only holds boards of one size)
+        '''
+        count = self.count(difficulty)
+        if count == 0 or size != self.size:
+            return None
+        return self.record(difficulty, self.rng.randrange(count))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_bank(path, counts, size=9, seed=0, workers=None):
+    '''
+    Generate puzzles and write them to a bank file as they arrive
+
+    Only the puzzles currently in flight are held in memory, so banks of any
+    size can be built. The bank is written to path + ".tmp" and renamed to path
+    when it is complete, so a build that fails or is interrupted never leaves a
+    bank with missing records behind.
+
+    Parameters:
+        path: file to write
+        counts: dict mapping difficulty name to number of puzzles, e.g. {"EASY": 1000}
+        size: board size (at most 15, since cells are stored as nibbles)
+        seed: batch seed; each difficulty uses its own derived seed
+        workers: worker processes passed to generate_batch
+    '''
+    if size > 15:
+        raise ValueError("puzzle banks store cells as nibbles, so size must be at most 15")
+
+    rec_size = record_size(size)
+    offset = HEADER.size + SECTION.size * len(counts)
+    sections = []
+    for name, count in counts.items():
+        sections.append(SECTION.pack(name.encode("ascii"), offset, count))
+        offset += count * rec_size
+
+    temp = path + ".tmp"
+    try:
+        with open(temp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, size, rec_size, len(counts)))
+            for section in sections:
+                f.write(section)
+            for i, (name, count) in enumerate(counts.items()):
+                removed = DIFFICULTY_CELLS[name] * size * size // 81
+                for _, board, solution in generate_batch(count, removed, size=size, seed=seed + i, workers=workers):
+                    f.write(pack_record(board, solution))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(temp)
+        raise
+    os.replace(temp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a puzzle bank file")
+    parser.add_argument("path", nargs="?", default=PUZZLE_BANK_PATH)
+    parser.add_argument("--count", type=int, default=1000, help="puzzles per difficulty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    build_bank(args.path, {name: args.count for name in DIFFICULTY_CELLS}, seed=args.seed, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''
+Short puzzle IDs that regenerate the same puzzle on demand
+
+An ID packs everything generate_sudoku needs to rebuild a puzzle:
+
+    1      format version (ID_VERSION)
+    H      difficulty: E, M or H
+    9      board size as one base-36 digit: 9, G (16) or P (25)
+    2KQ7Z0 the generator seed in base 36
+
+so "1H92KQ7Z0" is always the same HARD 9x9 puzzle. ID_VERSION must be bumped
+whenever a change to the generator would turn an old seed into a different
+puzzle; IDs from other versions are then rejected rather than silently
+giving a different grid.
+
+    new_puzzle_id("HARD")         -> a fresh random ID
+    make_puzzle_id(seed, "HARD")  -> the ID of a known seed (e.g. batch.item_seed)
+    puzzle_from_id(puzzle_id)     -> (board, solution)
+'''
+
+import random
+
+from constants import DIFFICULTY_CELLS
+from sudoku_generator import generate_sudoku
+
+ID_VERSION = 1
+
+# Bits of seed in IDs made by new_puzzle_id (8 base-36 characters)
+SEED_BITS = 40
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIFFICULTY_CODES = {name: name[0] for name in DIFFICULTY_CELLS}
+CODE_DIFFICULTIES = {code: name for name, code in DIFFICULTY_CODES.items()}
+
+
+def to_base36(number):
+    text = ""
+    while True:
+        number, digit = divmod(number, 36)
+        text = DIGITS[digit] + text
+        if number == 0:
+            return text
+
+
+def removed_cells(difficulty, size):
+    # Cells cleared for difficulty on a size x size board (DIFFICULTY_CELLS is for 9x9)
+    return DIFFICULTY_CELLS[difficulty] * size * size // 81
+
+
+def make_puzzle_id(seed, difficulty, size=9):
+    if seed < 0:
+        raise ValueError("seed must not be negative")
+    if difficulty not in DIFFICULTY_CODES:
+        raise ValueError(f"unknown difficulty {difficulty!r}")
+    if not 1 <= size < 36:
+        raise ValueError(f"board size {size} does not fit in a puzzle ID")
+    return f"{ID_VERSION}{DIFFICULTY_CODES[difficulty]}{DIGITS[size]}{to_base36(seed)}"
+
+
+def new_puzzle_id(difficulty, size=9, rng=random):
+    return make_puzzle_id(rng.getrandbits(SEED_BITS), difficulty, size)
+
+
+def parse_puzzle_id(puzzle_id):
+    '''
+    Split a puzzle ID into (seed, difficulty, size)
+    Raises ValueError if the ID is malformed or was made by another ID_VERSION.
+    '''
+    text = puzzle_id.strip().upper()
+    if len(text) < 4 or not text[0].isdigit():
+        raise ValueError(f"not a puzzle ID: {puzzle_id!r}")
+    if int(text[0]) != ID_VERSION:
+        raise ValueError(f"puzzle ID {puzzle_id!r} is version {text[0]}, only version {ID_VERSION} can be regenerated")
+    difficulty = CODE_DIFFICULTIES.get(text[1])
+    if difficulty is None:
+        raise ValueError(f"puzzle ID {puzzle_id!r} has an unknown difficulty")
+    size = DIGITS.find(text[2])
+    if size < 1 or (size ** 0.5) % 1:
+        raise ValueError(f"puzzle ID {puzzle_id!r} has an unknown board size")
+    # int() would also take a sign, spaces or underscores, which make_puzzle_id never writes
+    if not all(ch in DIGITS for ch in text[3:]):
+        raise ValueError(f"puzzle ID {puzzle_id!r} has a bad seed")
+    return int(text[3:], 36), difficulty, size
+
+
+def puzzle_from_id(puzzle_id):
+    '''
+    Regenerate the (board, solution) pair a puzzle ID stands for
+    '''
+    seed, difficulty, size = parse_puzzle_id(puzzle_id)
+    return generate_sudoku(size, removed_cells(difficulty, size), unique=True, seed=seed)
@@ -0,0 +1,153 @@
+'''
+Keeps a few puzzles of every difficulty and board size ready in the background
+
+A daemon thread fills one small queue per (difficulty, board size) and tops it
+up whenever a puzzle is taken, so starting a game does not have to wait for
+generation. A 25x25 puzzle takes seconds to make, so the game never makes one
+on its own thread: it asks for it with request() and shows a loading screen
+until get() has it (or uses a PuzzleLoader when its source is not a pool).
+
+Example:
+    pool = PuzzlePool()
+    pool.start()
+    board = Board(width, height, screen, "HARD", pool)
+'''
+
+import queue
+import random
+import threading
+
+from constants import BOARD_SIZES, DIFFICULTY_CELLS
+from grader import grade
+from puzzle_id import SEED_BITS, make_puzzle_id
+from sudoku_generator import generate_sudoku
+
+
+def make_puzzle(difficulty, removed, size=9, unique=True, seed=None):
+    '''
+    Generate and grade one puzzle
+
+    Parameters:
+        removed: cells to clear on a 9x9 board; bigger boards clear the same share of their cells
+
+    Returns:
+        (board, solution, trace, puzzle_id), where trace is the grader's solve trace used
+        for hints and puzzle_id is None unless puzzle_id.puzzle_from_id would make the same puzzle
+    '''
+    if seed is None:
+        seed = random.getrandbits(SEED_BITS)
+    board, solution = generate_sudoku(size, removed * size * size // 81, unique, seed)
+    standard = unique and removed == DIFFICULTY_CELLS.get(difficulty)
+    puzzle_id = make_puzzle_id(seed, difficulty, size) if standard else None
+    return board, solution, grade(board).trace, puzzle_id
+
+
+class PuzzleLoader:
+    '''
+    Makes one puzzle on a background thread; a puzzle source for just that puzzle
+
+    Example:
+        loader = PuzzleLoader("HARD", 25).start()
+        ...
+        puzzle = loader.get("HARD", 25)     # None until it is done
+    '''
+
+    def __init__(self, difficulty, size=9, difficulties=DIFFICULTY_CELLS):
+        self.key = (difficulty, size)
+        self.removed = difficulties[difficulty]
+        self.puzzle = None
+        self.thread = threading.Thread(target=self.produce, name="puzzle-loader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def produce(self):
+        self.puzzle = make_puzzle(self.key[0], self.removed, self.key[1])
+
+    def get(self, difficulty, size=9):
+        if (difficulty, size) != self.key:
+            return None
+        puzzle, self.puzzle = self.puzzle, None
+        return puzzle
+
+
+class PuzzlePool:
+    '''
+    Parameters:
+        size: number of 9x9 puzzles kept ready per difficulty
+        difficulties: dict mapping difficulty name to cells removed (on a 9x9 board)
+        unique: passed on to generate_sudoku
+        seen: optional dedup.DedupIndex; 9x9 puzzles already in it, in any disguise, are
+            skipped and new ones are added, so a player never gets the same puzzle twice
+        board_sizes: board sizes to keep puzzles ready for
+        large_size: puzzles kept ready per difficulty for boards bigger than 9x9,
+            which take far longer to make
+    '''
+
+    def __init__(self, size=3, difficulties=DIFFICULTY_CELLS, unique=True, seen=None, board_sizes=BOARD_SIZES,
+                 large_size=1):
+        self.difficulties = dict(difficulties)
+        self.unique = unique
+        self.seen = seen
+        self.queues = {(name, n): queue.Queue(maxsize=size if n == 9 else large_size)
+                       for n in board_sizes for name in self.difficulties}
+        # (difficulty, size) a player is waiting for, made before anything else
+        self.priority = None
+
+        # Set whenever a puzzle is taken so the producer wakes up to replace it
+        self.wanted = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.produce, name="puzzle-pool", daemon=True)
+
+    def start(self):
+        self.wanted.set()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.wanted.set()
+
+    def produce(self):
+        while not self.stopped.is_set():
+            self.wanted.wait()
+            self.wanted.clear()
+
+            # Make what a player is waiting for first, then fill the emptiest queue
+            # so one difficulty or size never starves the others
+            while not self.stopped.is_set():
+                key = self.priority
+                if key not in self.queues or self.queues[key].full():
+                    key = min(self.queues, key=lambda key: self.queues[key].qsize())
+                if self.queues[key].full():
+                    break
+                name, n = key
+                # Grade here too so Board gets its hint trace without solving on the UI thread
+                puzzle = make_puzzle(name, self.difficulties[name], n, self.unique)
+                if n == 9 and self.seen is not None and not self.seen.add(puzzle[0]):
+                    continue
+                self.queues[key].put(puzzle)
+
+    def get(self, difficulty, size=9):
+        '''
+        Return a ready (board, solution, trace, puzzle_id) tuple, or None if none is ready yet
+        trace is the grader's solve trace, used by Board for hints
+        '''
+        try:
+            puzzle = self.queues[(difficulty, size)].get_nowait()
+        except (KeyError, queue.Empty):
+            return None
+        if self.priority == (difficulty, size):
+            self.priority = None
+        self.wanted.set()
+        return puzzle
+
+    def request(self, difficulty, size=9):
+        # A player is waiting for this one: make it next
+        self.priority = (difficulty, size)
+        self.wanted.set()
+
+    def ready(self, difficulty, size=9):
+        # Number of puzzles currently waiting for difficulty and size
+        return self.queues[(difficulty, size)].qsize()
@@ -0,0 +1,242 @@
+'''
+Saving and restoring a game in progress
+
+A save is one small binary blob (all integers little-endian):
+
+    header      magic b"SDKS", version (u16), board size (u16),
+                selected cell (i16, -1 for none), flags (u8, bit 0 = auto-eliminate marks),
+                puzzle ID length (u8), elapsed seconds (f64), trace length (u32),
+                next hint (u16), difficulty (8 bytes, NUL padded)
+    puzzle ID   ASCII, may be empty
+    cells       values, givens, sketches and solution: one byte per cell each,
+                then pencil marks as a u32 per cell
+    trace       cells (u16 each), digits (u8 each), techniques (u8 each)
+    checksum    CRC-32 of everything before it (u32)
+
+Files are written to a temporary file first and then renamed over the old save,
+so a crash while saving leaves the previous save intact.
+
+    data = snapshot(state, "HARD", elapsed=42.0)
+    saved = restore(data)        -> SavedGame(state, difficulty, puzzle_id, selected, elapsed, auto_eliminate)
+    write_save(SAVE_PATH, data) / read_save(SAVE_PATH)
+
+Autosaver writes snapshots from a background thread so the game never waits for the disk.
+'''
+
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import namedtuple
+
+from constants import AUTOSAVE_MOVES, AUTOSAVE_SECONDS, SAVE_PATH
+from game_state import GameState
+
+MAGIC = b"SDKS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHhBBdIH8s")
+CHECKSUM = struct.Struct("<I")
+
+SavedGame = namedtuple("SavedGame", ["state", "difficulty", "puzzle_id", "selected", "elapsed", "auto_eliminate"])
+
+
+def little_endian(values):
+    # Bytes of an array in little-endian order whatever this machine uses
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def snapshot(state, difficulty, puzzle_id=None, selected=None, elapsed=0.0, auto_eliminate=True):
+    '''
+    Pack a GameState and the rest of the game into bytes
+
+    Parameters:
+        selected: flat index of the selected cell, or None
+        elapsed: seconds played so far
+    '''
+    puzzle_id = (puzzle_id or "").encode("ascii")
+    parts = [
+        HEADER.pack(MAGIC, VERSION, state.size, -1 if selected is None else selected,
+                    1 if auto_eliminate else 0, len(puzzle_id), elapsed, len(state.trace_cells),
+                    state.next_hint, difficulty.encode("ascii")),
+        puzzle_id,
+        state.values,
+        state.givens,
+        state.sketches,
+        state.solution,
+        little_endian(array('I', state.marks)),
+        little_endian(state.trace_cells),
+        state.trace_digits,
+        state.trace_techniques,
+    ]
+    data = b"".join(parts)
+    return data + CHECKSUM.pack(zlib.crc32(data))
+
+
+def restore(data, state=None):
+    '''
+    Unpack bytes made by snapshot into a SavedGame
+
+    Parameters:
+        state: optional GameState to load into (its buffers are reused when the size matches)
+
+    Raises:
+        ValueError if data is not a save, is damaged or was written by another version
+    '''
+    if len(data) < HEADER.size + CHECKSUM.size or data[:4] != MAGIC:
+        raise ValueError("not a saved game")
+    body, (checksum,) = data[:-CHECKSUM.size], CHECKSUM.unpack_from(data, len(data) - CHECKSUM.size)
+    if zlib.crc32(body) != checksum:
+        raise ValueError("saved game is damaged")
+    (_, version, size, selected, flags, id_length, elapsed, trace_length,
+     next_hint, difficulty) = HEADER.unpack_from(body, 0)
+    if version != VERSION:
+        raise ValueError(f"saved game is version {version}, expected {VERSION}")
+    cells = size * size
+    if len(body) != HEADER.size + id_length + 8 * cells + 4 * trace_length:
+        raise ValueError("saved game has the wrong length")
+
+    offset = HEADER.size
+
+    def take(length):
+        nonlocal offset
+        chunk = body[offset:offset + length]
+        offset += length
+        return chunk
+
+    puzzle_id = take(id_length).decode("ascii") or None
+    if state is None or state.size != size:
+        state = GameState(size)
+    state.values[:] = take(cells)
+    state.givens[:] = take(cells)
+    state.sketches[:] = take(cells)
+    state.solution[:] = take(cells)
+    state.marks[:] = array('L', from_little_endian('I', take(4 * cells)))
+    state.recount()
+    state.set_trace(from_little_endian('H', take(2 * trace_length)), take(trace_length), take(trace_length),
+                    next_hint)
+
+    return SavedGame(state, difficulty.rstrip(b"\0").decode("ascii"), puzzle_id,
+                     None if selected < 0 else selected, elapsed, bool(flags & 1))
+
+
+def write_save(path, data):
+    # Write data to path without ever leaving a half-written file behind
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def read_save(path=SAVE_PATH, state=None):
+    '''
+    Load the save at path, or return None if there is none
+    Raises ValueError if the file is not a usable save (see restore).
+    '''
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return restore(data, state)
+
+
+class Autosaver:
+    '''
+    Writes the latest snapshot to disk on a background thread
+
+    The game hands over a snapshot (see snapshot) after every move with offer(),
+    which only stores it. The thread writes it once `moves` snapshots have
+    piled up, or `seconds` after the first unsaved one.
+
+    Parameters:
+        path: save file
+        moves, seconds: when to write, see above
+    '''
+
+    def __init__(self, path=SAVE_PATH, moves=AUTOSAVE_MOVES, seconds=AUTOSAVE_SECONDS):
+        self.path = path
+        self.moves = moves
+        self.seconds = seconds
+
+        # Guards pending, unsaved and since
+        self.lock = threading.Lock()
+        # Held while touching the file so a write and a discard never overlap
+        self.file_lock = threading.Lock()
+        self.pending = None
+        self.unsaved = 0
+        self.since = None
+
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def offer(self, data):
+        with self.lock:
+            self.pending = data
+            self.unsaved += 1
+            # Wake the thread to start the clock on the first unsaved move, or to write now
+            wake = self.since is None or self.unsaved >= self.moves
+            if self.since is None:
+                self.since = time.monotonic()
+        if wake:
+            self.wake.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            # Sleep until the oldest unsaved move is `seconds` old, or until offer wakes us
+            with self.lock:
+                timeout = None if self.since is None else max(0.0, self.since + self.seconds - time.monotonic())
+            self.wake.wait(timeout)
+            self.wake.clear()
+            with self.lock:
+                due = self.pending is not None and (
+                    self.unsaved >= self.moves or time.monotonic() - self.since >= self.seconds)
+            if due:
+                self.flush()
+
+    def flush(self):
+        # Write the pending snapshot now, if there is one
+        with self.file_lock:
+            with self.lock:
+                data = self.pending
+                self.pending = None
+                self.unsaved = 0
+                self.since = None
+            if data is not None:
+                write_save(self.path, data)
+
+    def discard(self):
+        # Forget the game: drop anything pending and delete the save (the game ended)
+        with self.file_lock:
+            with self.lock:
+                self.pending = None
+                self.unsaved = 0
+                self.since = None
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,456 @@
+'''
+Local HTTP service that hands out puzzles and checks solutions
+
+Runs on asyncio with no extra dependencies. The event loop only parses
+requests and moves JSON around; generating and checking puzzles happens in a
+pool of worker processes:
+
+    - Each difficulty has a pool of ready puzzles that background tasks keep
+      topped up, so a request for a random puzzle is answered from memory.
+    - Puzzles by seed or ID are generated on demand (see puzzle_id.py).
+    - Solutions that arrive at about the same time are checked together as one
+      job, so hundreds of concurrent checks cost a handful of round trips to the workers.
+
+Endpoints (puzzles and solutions are 81-character strings, 0 for empty cells):
+
+    GET  /puzzle?difficulty=HARD              a puzzle from the ready pool
+    GET  /puzzle?difficulty=HARD&seed=1234    the puzzle for that seed
+    GET  /puzzle/<id>                         the puzzle for that ID
+         any of these with &solution=1 also returns the solution
+    POST /validate  {"puzzle": "...", "solution": "..."}
+                    or {"items": [{"puzzle": ..., "solution": ...}, ...]}
+    GET  /stats                               ready puzzles per difficulty and request counts
+
+Run with:
+    python3 service.py                        # http://127.0.0.1:8036
+    python3 service.py --port 0 --workers 4   # any free port
+    curl 'http://127.0.0.1:8036/puzzle?difficulty=EASY'
+'''
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+import solver
+from constants import (DIFFICULTY_CELLS, SERVICE_HOST, SERVICE_PORT, SERVICE_POOL_SIZE, SERVICE_POOL_WAIT,
+                       VALIDATE_BATCH, VALIDATE_WAIT)
+from puzzle_id import make_puzzle_id, new_puzzle_id, parse_puzzle_id, puzzle_from_id
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+# Connections the OS queues before accept. asyncio's default of 100 makes the rest of
+# a burst of clients wait a full second to retry their connect
+BACKLOG = 1024
+
+# Seconds a pool filler waits after a failed puzzle before it tries again
+RETRY_DELAY = 1.0
+
+# The only characters a puzzle or solution may hold (str.isdigit also takes '²', '٣', ...)
+DIGITS = frozenset("0123456789")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+##### WORKER FUNCTIONS (run in the process pool) #####
+
+def grid_string(grid):
+    return "".join(str(num) for row in grid for num in row)
+
+
+def make_puzzle(puzzle_id):
+    # Generate the puzzle for an ID as (id, puzzle, solution) strings
+    board, solution = puzzle_from_id(puzzle_id)
+    return puzzle_id, grid_string(board), grid_string(solution)
+
+
+def format_error(puzzle, solution):
+    # Returns None if puzzle and solution are both 81 ASCII digits, otherwise what is wrong
+    if not isinstance(puzzle, str) or not isinstance(solution, str):
+        return "puzzle and solution must be strings"
+    if len(puzzle) != 81 or len(solution) != 81 or not set(puzzle + solution) <= DIGITS:
+        return "puzzle and solution must be 81 digits (0-9) each"
+    return None
+
+
+def check_solution(puzzle, solution):
+    '''
+    Returns None if solution solves puzzle, otherwise the reason it does not
+    '''
+    error = format_error(puzzle, solution)
+    if error is not None:
+        return error
+    if any(given != "0" and given != num for given, num in zip(puzzle, solution)):
+        return "solution changes a given cell"
+    if "0" in solution:
+        return "solution has empty cells"
+    grid = [[int(num) for num in solution[r * 9:(r + 1) * 9]] for r in range(9)]
+    if not solver.is_solution(grid):
+        return "solution breaks a rule"
+    return None
+
+
+def check_solutions(items):
+    # Check a batch of (puzzle, solution) pairs in one job. An item that fails
+    # gets its exception as its result, so it cannot take the rest of the batch down
+    results = []
+    for puzzle, solution in items:
+        try:
+            results.append(check_solution(puzzle, solution))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+##### SERVICE #####
+
+class ValidationBatcher:
+    '''
+    Collects solutions to check and sends them to the workers in batches
+
+    A batch goes out once it has batch_size items or wait seconds after its
+    first item, whichever comes first.
+
+    Parameters:
+        work: coroutine function that runs a function in the workers (see PuzzleService.work)
+    '''
+
+    def __init__(self, work, batch_size=VALIDATE_BATCH, wait=VALIDATE_WAIT):
+        self.work = work
+        self.batch_size = batch_size
+        self.wait = wait
+        self.pending = []
+        self.timer = None
+        self.batches = 0
+
+    def check(self, puzzle, solution):
+        # Future that resolves to the result of check_solution
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(((puzzle, solution), future))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.wait, self.flush)
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.batches += 1
+            asyncio.ensure_future(self.run(batch))
+
+    async def run(self, batch):
+        try:
+            results = await self.work(check_solutions, [item for item, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class PuzzleService:
+    '''
+    Parameters:
+        workers: worker processes (default: one per CPU)
+        pool_size: ready puzzles kept per difficulty
+        difficulties: names of the difficulties served (keys of DIFFICULTY_CELLS)
+        pool_wait: seconds a request waits for a ready puzzle before it has one made for itself
+    '''
+
+    def __init__(self, workers=None, pool_size=SERVICE_POOL_SIZE, difficulties=tuple(DIFFICULTY_CELLS),
+                 pool_wait=SERVICE_POOL_WAIT):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool_size = pool_size
+        self.pool_wait = pool_wait
+        self.difficulties = difficulties
+        self.executor = None
+        self.batcher = None
+        self.pools = {}
+        self.tasks = []
+        self.server = None
+        self.requests = 0
+        self.errors = 0
+        # Failed attempts to fill the ready pools, and the last one's error
+        self.fill_errors = 0
+        self.last_fill_error = None
+
+    async def start(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        # Start the workers, the pool fillers and the server. Returns the port listened on
+        self.executor = self.new_executor()
+        self.batcher = ValidationBatcher(self.work)
+        # Each filler keeps one job in the workers, so a full pool set leaves them free for other requests
+        fillers = max(1, self.workers // len(self.difficulties))
+        for difficulty in self.difficulties:
+            self.pools[difficulty] = asyncio.Queue(self.pool_size)
+            for _ in range(fillers):
+                self.tasks.append(asyncio.ensure_future(self.fill(difficulty)))
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=BACKLOG)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def work(self, function, *args):
+        # Run function(*args) in the workers. If a worker died, the pool is replaced for the next job
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            self.restart_workers(executor)
+            raise
+
+    def restart_workers(self, broken):
+        # Replace a broken process pool once, however many jobs saw it break
+        if self.executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.new_executor()
+
+    def new_executor(self):
+        # Workers are spawned, not forked: a forked worker would keep copies of the open client
+        # sockets, and closing a connection here would no longer reach the client
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def fill(self, difficulty):
+        # Keep one puzzle of difficulty generating; it waits here while the pool is full.
+        # A failure never ends the loop: it is counted, shown in /stats and retried
+        pool = self.pools[difficulty]
+        while True:
+            try:
+                puzzle = await self.work(make_puzzle, new_puzzle_id(difficulty))
+            except Exception as error:
+                self.fill_errors += 1
+                self.last_fill_error = f"{type(error).__name__}: {error}"
+                print(f"Could not fill the {difficulty} pool: {self.last_fill_error}", file=sys.stderr, flush=True)
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            await pool.put(puzzle)
+
+    async def generate(self, puzzle_id):
+        # Check the ID here so only 9x9 puzzles ever reach the workers
+        try:
+            _, _, size = parse_puzzle_id(puzzle_id)
+        except ValueError as error:
+            raise HttpError(400, str(error)) from None
+        if size != 9:
+            raise HttpError(400, f"puzzle ID {puzzle_id!r} is for a {size}x{size} board; only 9x9 puzzles are served")
+
+        # The ID is valid by now, so anything that goes wrong is the service's fault
+        try:
+            return await self.work(make_puzzle, puzzle_id)
+        except Exception as error:
+            raise HttpError(500, f"could not generate puzzle {puzzle_id!r}: {type(error).__name__}: {error}") from None
+
+    ##### ENDPOINTS #####
+
+    async def get_puzzle(self, path, query):
+        if path.startswith("/puzzle/"):
+            puzzle_id, difficulty = path[len("/puzzle/"):], None
+        else:
+            difficulty = query.get("difficulty", "MEDIUM").upper()
+            if difficulty not in self.pools:
+                raise HttpError(400, f"difficulty must be one of {', '.join(self.pools)}")
+            puzzle_id = None
+            if "seed" in query:
+                try:
+                    puzzle_id = make_puzzle_id(int(query["seed"]), difficulty)
+                except ValueError:
+                    raise HttpError(400, "seed must be a non-negative integer") from None
+
+        if puzzle_id is None:
+            try:
+                puzzle_id, puzzle, solution = await asyncio.wait_for(self.pools[difficulty].get(), self.pool_wait)
+            except asyncio.TimeoutError:
+                # The fillers are behind or failing: make one for this request, which reports any error
+                puzzle_id, puzzle, solution = await self.generate(new_puzzle_id(difficulty))
+        else:
+            puzzle_id, puzzle, solution = await self.generate(puzzle_id)
+
+        result = {"id": puzzle_id, "puzzle": puzzle}
+        if query.get("solution") in ("1", "true"):
+            result["solution"] = solution
+        return result
+
+    async def validate(self, body):
+        try:
+            request = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            raise HttpError(400, "body must be JSON") from None
+        if not isinstance(request, dict):
+            raise HttpError(400, "body must be a JSON object")
+
+        items = request.get("items", [request])
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HttpError(400, "items must be a list of objects")
+        # Malformed items are turned away here, before they can join a batch
+        for item in items:
+            error = format_error(item.get("puzzle"), item.get("solution"))
+            if error is not None:
+                raise HttpError(400, error)
+        errors = await asyncio.gather(*(self.batcher.check(item.get("puzzle"), item.get("solution"))
+                                        for item in items))
+        results = [{"valid": error is None, "error": error} for error in errors]
+        return {"results": results} if "items" in request else results[0]
+
+    def stats(self):
+        return {
+            "ready": {difficulty: pool.qsize() for difficulty, pool in self.pools.items()},
+            "workers": self.workers,
+            "requests": self.requests,
+            "errors": self.errors,
+            "fill_errors": self.fill_errors,
+            "last_fill_error": self.last_fill_error,
+            "validation_batches": self.batcher.batches,
+        }
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if path == "/puzzle" or path.startswith("/puzzle/"):
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            return await self.get_puzzle(path, query)
+        if path == "/validate":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            return await self.validate(body)
+        if path == "/stats":
+            return self.stats()
+        raise HttpError(404, f"no such endpoint: {path}")
+
+    ##### HTTP #####
+
+    async def handle(self, reader, writer):
+        # Serve requests on one connection until the client closes it or asks to
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.requests += 1
+                try:
+                    status, result = 200, await self.route(method, target, body)
+                except HttpError as error:
+                    self.errors += 1
+                    status, result = error.status, {"error": str(error)}
+                except Exception as error:
+                    self.errors += 1
+                    status, result = 500, {"error": f"{type(error).__name__}: {error}"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(response(status, result, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as error:
+            # The request itself could not be read; answer once and hang up
+            self.errors += 1
+            writer.write(response(error.status, {"error": str(error)}, False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader):
+    '''
+    Read one HTTP/1.1 request as (method, target, headers, body), or None at end of stream
+    '''
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as error:
+        if error.partial.strip():
+            raise HttpError(400, "incomplete request") from None
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "request headers too large") from None
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ")
+    except ValueError:
+        raise HttpError(400, "bad request line") from None
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "bad Content-Length") from None
+    if length > MAX_BODY:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def response(status, result, keep_alive=True):
+    body = json.dumps(result).encode()
+    head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+async def serve(host, port, workers, pool_size):
+    service = PuzzleService(workers, pool_size)
+    port = await service.start(host, port)
+    print(f"Serving puzzles on http://{host}:{port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve puzzles over HTTP on this machine")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="0 picks any free port")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--pool", type=int, default=SERVICE_POOL_SIZE, help="ready puzzles kept per difficulty")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.pool))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+'''
+Exact-cover Sudoku solver (Knuth's Algorithm X with dancing links)
+
+Works on any partial grid whose size is a perfect square (4x4, 9x9, 16x16, ...).
+Grids are 2D lists of ints where 0 means empty, the same format used by
+generate_sudoku and Board.
+
+    solve(grid)                 -> first solution or None
+    count_solutions(grid, 2)    -> number of solutions, stopping at the limit
+    iter_solutions(grid)        -> generator yielding solutions one at a time
+'''
+
+import math
+
+
+class SearchLimitExceeded(Exception):
+    '''
+    Raised when a search tries more rows than its max_steps allows
+    '''
+
+
+class DancingLinks:
+    '''
+    Sparse exact-cover matrix stored as parallel lists of node links
+
+    Node 0 is the root header, nodes 1..num_columns are the column headers and
+    every node after that is a 1 in the matrix. Each matrix row carries an
+    arbitrary label which is reported back for every row in a solution.
+
+    Parameters:
+        num_columns: number of constraints that must each be covered exactly once
+        max_steps: if set, search raises SearchLimitExceeded after trying this many rows
+    '''
+
+    def __init__(self, num_columns, max_steps=None):
+        self.num_columns = num_columns
+        self.max_steps = max_steps
+        self.steps = 0
+        count = num_columns + 1
+        self.left = [i - 1 for i in range(count)]
+        self.right = [i + 1 for i in range(count)]
+        self.left[0] = num_columns
+        self.right[num_columns] = 0
+        self.up = list(range(count))
+        self.down = list(range(count))
+        self.column = list(range(count))
+        self.size = [0] * count
+        self.label = [None] * count
+
+    def add_row(self, columns, label):
+        '''
+        Add a matrix row with 1s in the given columns (numbered from 1)
+        '''
+        first = len(self.left)
+        for i, col in enumerate(columns):
+            node = first + i
+            self.left.append(node - 1 if i else first + len(columns) - 1)
+            self.right.append(node + 1 if i < len(columns) - 1 else first)
+            self.up.append(self.up[col])
+            self.down.append(col)
+            self.column.append(col)
+            self.label.append(label)
+            self.down[self.up[col]] = node
+            self.up[col] = node
+            self.size[col] += 1
+
+    def cover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        row = down[col]
+        while row != col:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                size[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def uncover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        row = up[col]
+        while row != col:
+            node = left[row]
+            while node != row:
+                size[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    def search(self, partial=None):
+        '''
+        Generator yielding every exact cover as a list of row labels
+        Always branches on the column with the fewest remaining rows.
+        '''
+        if partial is None:
+            partial = []
+        right, down, size = self.right, self.down, self.size
+
+        if right[0] == 0:
+            yield list(partial)
+            return
+
+        best = right[0]
+        col = right[best]
+        while col != 0 and size[best] > 1:
+            if size[col] < size[best]:
+                best = col
+            col = right[col]
+        if size[best] == 0:
+            return
+
+        self.cover(best)
+        row = down[best]
+        while row != best:
+            self.steps += 1
+            if self.max_steps is not None and self.steps > self.max_steps:
+                raise SearchLimitExceeded(f"gave up after {self.max_steps} steps")
+            partial.append(self.label[row])
+            node = right[row]
+            while node != row:
+                self.cover(self.column[node])
+                node = right[node]
+
+            yield from self.search(partial)
+
+            node = self.left[row]
+            while node != row:
+                self.uncover(self.column[node])
+                node = self.left[node]
+            partial.pop()
+            row = down[row]
+        self.uncover(best)
+
+
+def fill_singles(grid):
+    '''
+    Return a copy of grid with every naked and hidden single filled in
+
+    Repeats until no cell is forced any more. This does not change the set of
+    solutions, but it leaves far fewer cells for the exact-cover search, which
+    matters most on 16x16 and larger boards.
+
+    Returns:
+        new 2D list, or None if the grid breaks a rule or a contradiction is found
+    '''
+    n = len(grid)
+    box = math.isqrt(n)
+    if box * box != n or any(len(row) != n for row in grid):
+        raise ValueError(f"grid must be square with a perfect-square size, got {n} rows")
+    all_digits = (1 << n) - 1
+
+    values = [num for row in grid for num in row]
+    row_of = [i // n for i in range(n * n)]
+    col_of = [i % n for i in range(n * n)]
+    box_of = [row_of[i] // box * box + col_of[i] // box for i in range(n * n)]
+    units = [[r * n + c for c in range(n)] for r in range(n)]
+    units += [[r * n + c for r in range(n)] for c in range(n)]
+    units += [[(b // box * box + i // box) * n + b % box * box + i % box for i in range(n)] for b in range(n)]
+
+    row_used = [0] * n
+    col_used = [0] * n
+    box_used = [0] * n
+
+    def place(i, num):
+        bit = 1 << (num - 1)
+        if (row_used[row_of[i]] | col_used[col_of[i]] | box_used[box_of[i]]) & bit:
+            return False
+        values[i] = num
+        row_used[row_of[i]] |= bit
+        col_used[col_of[i]] |= bit
+        box_used[box_of[i]] |= bit
+        return True
+
+    for i, num in enumerate(values):
+        if num:
+            if not 1 <= num <= n:
+                raise ValueError(f"value {num} at ({row_of[i]}, {col_of[i]}) is outside 1..{n}")
+            values[i] = 0
+            if not place(i, num):
+                return None
+
+    def candidates(i):
+        return all_digits & ~(row_used[row_of[i]] | col_used[col_of[i]] | box_used[box_of[i]])
+
+    changed = True
+    while changed:
+        changed = False
+
+        # Naked singles: cells with one candidate left
+        for i in range(n * n):
+            if values[i]:
+                continue
+            cand = candidates(i)
+            if cand == 0:
+                return None
+            if cand & (cand - 1) == 0:
+                place(i, cand.bit_length())
+                changed = True
+
+        # Hidden singles: digits with one possible cell left in a unit
+        for unit in units:
+            once = twice = placed = 0
+            cands = []
+            for i in unit:
+                if values[i]:
+                    placed |= 1 << (values[i] - 1)
+                    cands.append(0)
+                else:
+                    cand = candidates(i)
+                    twice |= once & cand
+                    once |= cand
+                    cands.append(cand)
+            if (once | placed) != all_digits:
+                return None
+            hidden = once & ~twice & ~placed
+            while hidden:
+                bit = hidden & -hidden
+                hidden ^= bit
+                for i, cand in zip(unit, cands):
+                    if cand & bit:
+                        # A cell that is the only home for two digits is a contradiction
+                        if values[i]:
+                            return None
+                        place(i, bit.bit_length())
+                        changed = True
+                        break
+
+    return [values[r * n:(r + 1) * n] for r in range(n)]
+
+
+def build_matrix(grid, max_steps=None):
+    '''
+    Build the exact-cover matrix for a partial grid
+
+    Givens are applied up front: their constraints are never added as columns and
+    candidates that clash with them are never added as rows, so the matrix only
+    describes the empty cells. max_steps is passed on to DancingLinks.
+
+    Returns:
+        (DancingLinks, box) or (None, box) if the givens already break a rule
+    '''
+    n = len(grid)
+    box = math.isqrt(n)
+    if box * box != n or any(len(row) != n for row in grid):
+        raise ValueError(f"grid must be square with a perfect-square size, got {n} rows")
+
+    row_used = [0] * n
+    col_used = [0] * n
+    box_used = [0] * n
+    for r in range(n):
+        for c in range(n):
+            num = grid[r][c]
+            if num == 0:
+                continue
+            if not 1 <= num <= n:
+                raise ValueError(f"value {num} at ({r}, {c}) is outside 1..{n}")
+            bit = 1 << (num - 1)
+            b = r // box * box + c // box
+            if (row_used[r] | col_used[c] | box_used[b]) & bit:
+                return None, box
+            row_used[r] |= bit
+            col_used[c] |= bit
+            box_used[b] |= bit
+
+    # Number only the constraints that are still open
+    cell_col = {}
+    row_col = {}
+    col_col = {}
+    box_col = {}
+    next_col = 1
+    for r in range(n):
+        for c in range(n):
+            if grid[r][c] == 0:
+                cell_col[r, c] = next_col
+                next_col += 1
+    for i in range(n):
+        for num in range(1, n + 1):
+            bit = 1 << (num - 1)
+            if not row_used[i] & bit:
+                row_col[i, num] = next_col
+                next_col += 1
+            if not col_used[i] & bit:
+                col_col[i, num] = next_col
+                next_col += 1
+            if not box_used[i] & bit:
+                box_col[i, num] = next_col
+                next_col += 1
+
+    matrix = DancingLinks(next_col - 1, max_steps)
+    for (r, c), cell in cell_col.items():
+        b = r // box * box + c // box
+        used = row_used[r] | col_used[c] | box_used[b]
+        for num in range(1, n + 1):
+            if not used & (1 << (num - 1)):
+                matrix.add_row((cell, row_col[r, num], col_col[c, num], box_col[b, num]), (r, c, num))
+    return matrix, box
+
+
+def iter_solutions(grid):
+    '''
+    Lazily yield every solution of grid as a new 2D list
+    The input grid is not modified.
+    '''
+    grid = fill_singles(grid)
+    if grid is None:
+        return
+    matrix, _ = build_matrix(grid)
+    if matrix is None:
+        return
+    for labels in matrix.search():
+        solution = [list(row) for row in grid]
+        for r, c, num in labels:
+            solution[r][c] = num
+        yield solution
+
+
+def solve(grid):
+    '''
+    Return the first solution of grid, or None if it has no solution
+    '''
+    return next(iter_solutions(grid), None)
+
+
+def count_solutions(grid, limit=2, max_steps=None):
+    '''
+    Count the solutions of grid, stopping once limit solutions have been found
+    count_solutions(grid, 2) == 1 means the puzzle has a unique solution.
+    With max_steps set, SearchLimitExceeded is raised if the search runs longer.
+    '''
+    grid = fill_singles(grid)
+    if grid is None:
+        return 0
+    matrix, _ = build_matrix(grid, max_steps)
+    if matrix is None:
+        return 0
+    found = 0
+    for _ in matrix.search():
+        found += 1
+        if found >= limit:
+            break
+    return found
+
+
+def is_solution(grid):
+    '''
+    Determines if grid is completely filled in and breaks no Sudoku rule
+    '''
+    if any(num == 0 for row in grid for num in row):
+        return False
+    return count_solutions(grid, 1) == 1
@@ -2,12 +2,55 @@
 Displays the graphical user interface (GUI) for the Sudoku game
 '''
 
+import os
 import pygame
 import sys
+import time
 
 # See constants.py for more information
 from constants import *
 from Board import Board
+from puzzle_bank import PuzzleBank
+from puzzle_pool import PuzzleLoader, PuzzlePool
+from glyph_cache import glyphs
+from metrics import metrics
+from savegame import Autosaver, read_save, snapshot
+
+
+class DirtyRegions:
+    '''
+    Collects the parts of the screen that changed during a frame so that only
+    those are sent to the display. Anything that fills the whole screen asks for
+    a full update instead.
+    '''
+    def __init__(self):
+        self.rects = []
+        self.full = False
+
+    def add(self, rect):
+        self.rects.append(pygame.Rect(rect))
+
+    def add_all(self, rects):
+        self.rects.extend(rects)
+
+    def add_full(self):
+        self.full = True
+
+    def flush(self):
+        # Push this frame's changes to the display
+        if self.full:
+            pygame.display.flip()
+        elif self.rects:
+            pygame.display.update(self.rects)
+        self.rects = []
+        self.full = False
+
+
+# Shared by every menu and button
+dirty_regions = DirtyRegions()
+
+# Posted while the loading screen waits, to check whether the puzzle is ready
+LOADING_CHECK = pygame.USEREVENT + 1
 
 
 class Menu:
@@ -31,23 +74,22 @@ class Menu:
         Render text at position (x, y) with a specific font size
         '''
         # Create font of text
-        font = pygame.font.Font(font_family, font_size)
-        img = font.render(text, True, self.font_color)
+        img = glyphs.text(text, font_size, self.font_color, font_family)
 
         # Display text to screen
         x, y = pos
-        self.screen.blit(img, (x, y))
+        dirty_regions.add(self.screen.blit(img, (x, y)))
 
     def get_img_size(self, text: str, font_size: int, font_family=None):
         # Get the size of a text box's image
-        font = pygame.font.Font(font_family, font_size)
-        img = font.render(text, True, self.font_color)
+        img = glyphs.text(text, font_size, self.font_color, font_family)
 
         return img.get_width(), img.get_height()
 
     def reset_screen(self):
         # Resets screen by filling it all in with the background color
         self.screen.fill(self.background_color)
+        dirty_regions.add_full()
 
 
 class MainMenu(Menu):
@@ -68,10 +110,13 @@ class MainMenu(Menu):
         self.title = "Welcome to Sudoku!"
         self.select_game_mode = "Select Game Mode:"
 
+        # Number of rows/columns of the next board. Cycled with the size button
+        self.board_size = BOARD_SIZES[0]
+
     def render(self):
         Menu.current_menu = "main menu"
 
-        self.screen.fill(self.background_color)
+        self.reset_screen()
 
         ##### TITLE #####
 
@@ -142,10 +187,26 @@ class MainMenu(Menu):
             button_text="Hard"
         )
 
+        # Board size button
+        self.size_button = Button(
+            screen=self.screen,
+            x=(self.screen.get_width() * 1/2) - 0.5*width,
+            y=(self.screen.get_height() * 7/8) - height,
+            width=width,
+            height=self.button_font_size * 1.25,
+            button_text=f"{self.board_size}x{self.board_size}"
+        )
+
         # Draw buttons to screen
         self.easy_button.draw()
         self.medium_button.draw()
         self.hard_button.draw()
+        self.size_button.draw()
+
+    def next_board_size(self):
+        # Switch to the next size in BOARD_SIZES, wrapping around
+        index = BOARD_SIZES.index(self.board_size)
+        self.board_size = BOARD_SIZES[(index + 1) % len(BOARD_SIZES)]
 
     # NOTE: this method is currently unused. Consider removing later
     @classmethod
@@ -154,9 +215,16 @@ class MainMenu(Menu):
 
 class SudokuMenu(Menu):
     # Draws sudoku board and menu buttons below sudoku board
-    def __init__(self, screen, difficulty):
+    def __init__(self, screen, difficulty, puzzle_source=None, board_size=9):
         super().__init__(screen)
         self.difficulty = difficulty
+        self.puzzle_source = puzzle_source
+        self.board_size = board_size
+        self.board = None
+        # SavedGame for the next render_board to carry on with instead of a new puzzle
+        self.saved = None
+        # Ready puzzle tuple for the next render_board (see Board)
+        self.puzzle = None
 
     def render_board(self):
         # Calculate biggest square that can be made by Sudoku board. This is useful for self.render_menu()
@@ -169,8 +237,13 @@ class SudokuMenu(Menu):
         elif self.height > self.width:
             self.height = self.width
 
-        #Draw board
-        self.board = Board(self.width, self.height, self.screen, self.difficulty)
+        #Draw board, reusing the last game's state buffers and cells
+        state = self.board.state if self.board is not None else None
+        cells = self.board.flat if self.board is not None else None
+        self.board = Board(self.width, self.height, self.screen, self.difficulty, self.puzzle_source, self.board_size,
+                           state, self.saved, self.puzzle, cells)
+        self.saved = None
+        self.puzzle = None
         self.board.draw()
 
     def render_menu(self):
@@ -222,6 +295,21 @@ class SudokuMenu(Menu):
         self.exit_button.draw()
 
         
+class LoadingMenu(Menu):
+    # Shown while a puzzle that was not ready yet is made in the background
+    def render(self, difficulty, size):
+        self.reset_screen()
+        for text, font_size, y in ((f"Making a {size}x{size} {difficulty.lower()} puzzle...", 40, 0.4),
+                                   ("Press Esc to go back", 25, 0.55)):
+            img_width, img_height = self.get_img_size(text=text, font_size=font_size)
+            self.render_text(
+                text = text,
+                font_size = font_size,
+                pos = ((self.screen.get_width() - img_width) / 2, self.screen.get_height() * y),
+                font_family = None
+            )
+
+
 class GameOverMenu(Menu):
     def __init__(self, screen, user_won: bool):
         super().__init__(screen)
@@ -275,10 +363,56 @@ class GameOverMenu(Menu):
 
         self.button.draw()
 
+class PerformanceHud(Menu):
+    '''
+    One line of performance numbers along the bottom of the window:
+    frames per second, frame time percentiles and the cost of the last generated puzzle
+    '''
+    def __init__(self, screen, font_size=18):
+        super().__init__(screen, font_color=(90, 90, 90))
+        self.font_size = font_size
+        self.rect = pygame.Rect(0, screen.get_height() - font_size, screen.get_width(), font_size)
+
+    def render(self, fps):
+        frame = metrics.timing("frame")
+        generate = metrics.timing("generate")
+        parts = [f"{fps:.0f} FPS"]
+        if frame is not None:
+            parts.append(f"frame p50 {frame['p50_ms']:.1f} p95 {frame['p95_ms']:.1f} p99 {frame['p99_ms']:.1f} ms")
+        if generate is not None:
+            parts.append(f"last puzzle {generate['last_ms']:.1f} ms")
+
+        # Text is not cached: it changes nearly every frame
+        img = glyphs.font(self.font_size).render("   ".join(parts), True, self.font_color)
+        self.screen.fill(self.background_color, self.rect)
+        self.screen.blit(img, (4, self.rect.y))
+        dirty_regions.add(self.rect)
+
+    def hide(self):
+        self.screen.fill(self.background_color, self.rect)
+        dirty_regions.add(self.rect)
+
+
 def test_function(difficulty):
     print(difficulty)
 
 
+def key_value(key, size):
+    '''
+    Returns the cell value typed with key, or None if key does not enter a value
+    1-9 are typed with the number keys and 10 and up with A, B, C, ... (see glyph_cache.value_symbol)
+    '''
+    if pygame.K_1 <= key <= pygame.K_9:
+        value = key - pygame.K_0
+    elif pygame.K_a <= key <= pygame.K_z:
+        value = key - pygame.K_a + 10
+    else:
+        return None
+    if value > size:
+        return None
+    return value
+
+
 class Button:
     '''
     Creates clickable buttons. Also defines default themes for clickable buttons.
@@ -310,8 +444,7 @@ class Button:
         self.button_rect = pygame.Rect(self.x, self.y, self.width, self.height)
 
         # Create text for button
-        font = pygame.font.Font(None, self.font_size)
-        self.img = font.render(self.button_text, True, self.font_color)
+        self.img = glyphs.text(self.button_text, self.font_size, self.font_color)
 
         # Calculate text position to center it within the button
         self.text_x = (self.width - self.img.get_width()) // 2
@@ -323,6 +456,8 @@ class Button:
 
         self.button_surface.blit(self.img, (self.text_x, self.text_y))
         self.screen.blit(self.button_surface, self.button_rect)
+        self.fill_state = 'normal'
+        dirty_regions.add(self.button_rect)
 
     def process(self, event):
         '''
@@ -330,16 +465,16 @@ class Button:
         '''
 
         mouse_pos = pygame.mouse.get_pos()
-        self.button_surface.fill(self.fill_colors['normal'])
+        fill_state = 'normal'
 
         # If mouse is inside button_rect, change the button color to hover
         if self.button_rect.collidepoint(mouse_pos):
-            self.button_surface.fill(self.fill_colors['hover'])
+            fill_state = 'hover'
 
             # If clicked with left mouse button, color the button to show that it is being pressed
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1 and self.button_rect.collidepoint(event.pos):
-                    self.button_surface.fill(self.fill_colors['pressed'])
+                    fill_state = 'pressed'
                     self.clicked = True
 
             elif event.type == pygame.MOUSEBUTTONUP:
@@ -348,9 +483,13 @@ class Button:
                     self.clicked = False
                     self.run()
 
-        # Render button (useful in case the user hovers over the button and the fill color must be changed)
-        self.button_surface.blit(self.img, (self.text_x, self.text_y))
-        self.screen.blit(self.button_surface, self.button_rect)
+        # Render button only when its color changes (e.g. the user starts or stops hovering over it)
+        if fill_state != self.fill_state:
+            self.fill_state = fill_state
+            self.button_surface.fill(self.fill_colors[fill_state])
+            self.button_surface.blit(self.img, (self.text_x, self.text_y))
+            self.screen.blit(self.button_surface, self.button_rect)
+            dirty_regions.add(self.button_rect)
 
     def run(self, *args):
         try:
@@ -360,202 +499,340 @@ class Button:
             print("ERROR: No function found.")
 
 
+class Game:
+    '''
+    Runs the game as a set of scenes: "main menu", "sudoku board" and "game over".
+
+    Each frame drains every pending event, passes each one to the current
+    scene's handler, and then renders once. When nothing is happening the loop
+    sleeps in pygame.event.wait() instead of spinning.
+
+    With an autosaver (see savegame.py) the board is snapshotted after every
+    key press and click, saved right away when the game is closed and deleted
+    when it ends.
+    '''
+
+    def __init__(self, screen, puzzle_source=None, fps=60, autosaver=None):
+        self.screen = screen
+        self.fps = fps
+        self.fps_clock = pygame.time.Clock()
+        self.autosaver = autosaver
+
+        # Seconds played in earlier sessions of this game, and when this session's play started
+        self.played = 0.0
+        self.started = time.monotonic()
+
+        # F4 shows the performance HUD
+        self.hud = PerformanceHud(screen)
+        self.show_hud = False
+
+        self.menu = Menu(screen)
+        self.main_menu = MainMenu(screen)
+        self.sudoku_menu = SudokuMenu(screen, difficulty=None, puzzle_source=puzzle_source)
+        self.game_over_menu = GameOverMenu(screen, user_won=None)
+        self.loading_menu = LoadingMenu(screen)
+        # Source the loading screen is waiting on, and the (difficulty, size) it waits for
+        self.loader = None
+        self.loading = None
+
+        # Scene name -> function handling one event in that scene
+        self.scenes = {
+            'main menu': self.main_menu_event,
+            'loading': self.loading_event,
+            'sudoku board': self.board_event,
+            'game over': self.game_over_event,
+        }
+        self.show_main_menu()
+
+    ##### SCENE CHANGES #####
+
+    def show_main_menu(self):
+        self.scene = 'main menu'
+        self.main_menu.render()
+
+    def start_game(self, difficulty, saved=None, puzzle=None):
+        size = self.main_menu.board_size
+        if saved is None and puzzle is None:
+            # Never make a puzzle on this thread: take a ready one or wait on the loading screen
+            source = self.sudoku_menu.puzzle_source
+            puzzle = source.get(difficulty, size) if source is not None else None
+            if puzzle is None:
+                self.show_loading(difficulty, size)
+                return
+
+        self.menu.reset_screen()
+        self.scene = 'sudoku board'
+        self.sudoku_menu.difficulty = difficulty
+        self.sudoku_menu.board_size = size
+        self.sudoku_menu.saved = saved
+        self.sudoku_menu.puzzle = puzzle
+        self.sudoku_menu.render_board()
+        self.sudoku_menu.render_menu()
+        self.played = saved.elapsed if saved is not None else 0.0
+        self.started = time.monotonic()
+
+    def resume(self, saved):
+        # Carry on with a SavedGame, e.g. the one left behind when the window was closed
+        self.start_game(saved.difficulty, saved)
+        if saved.selected is not None:
+            self.sudoku_menu.board.select(*divmod(saved.selected, saved.state.size))
+
+    def show_loading(self, difficulty, size):
+        # A pool makes the puzzle next when asked; any other source gets a loader of its own
+        source = self.sudoku_menu.puzzle_source
+        if hasattr(source, 'request'):
+            source.request(difficulty, size)
+            self.loader = source
+        else:
+            self.loader = PuzzleLoader(difficulty, size).start()
+        self.loading = (difficulty, size)
+        self.scene = 'loading'
+        self.loading_menu.render(difficulty, size)
+        pygame.time.set_timer(LOADING_CHECK, 100)
+
+    def stop_loading(self):
+        pygame.time.set_timer(LOADING_CHECK, 0)
+        self.loader = None
+        self.loading = None
+
+    def show_game_over(self, user_won):
+        self.end_game()
+        self.menu.reset_screen()
+        self.scene = 'game over'
+        self.game_over_menu = GameOverMenu(self.screen, user_won)
+        self.game_over_menu.render()
+
+    ##### EVENT HANDLERS #####
+
+    def main_menu_event(self, event):
+        main_menu = self.main_menu
+        for button, difficulty in ((main_menu.easy_button, 'EASY'), (main_menu.medium_button, 'MEDIUM'),
+                                   (main_menu.hard_button, 'HARD')):
+            button.process(event)
+            if button.clicked:
+                button.clicked = False
+                self.start_game(difficulty)
+                return
+
+        main_menu.size_button.process(event)
+        if main_menu.size_button.clicked:
+            main_menu.size_button.clicked = False
+
+            # Show the newly selected board size on the button
+            main_menu.next_board_size()
+            main_menu.render()
+
+    def loading_event(self, event):
+        if event.type == LOADING_CHECK:
+            difficulty, size = self.loading
+            puzzle = self.loader.get(difficulty, size)
+            if puzzle is not None:
+                self.stop_loading()
+                self.start_game(difficulty, puzzle=puzzle)
+
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.stop_loading()
+            self.show_main_menu()
+
+    def board_event(self, event):
+        sudoku_menu = self.sudoku_menu
+        board = sudoku_menu.board
+        sudoku_menu.reset_button.process(event)
+        sudoku_menu.restart_button.process(event)
+        sudoku_menu.exit_button.process(event)
+
+        if sudoku_menu.reset_button.clicked:
+            sudoku_menu.reset_button.clicked = False
+            board.reset_to_original()
+
+        elif sudoku_menu.restart_button.clicked:
+            # Take user back to main menu, giving up this game
+            sudoku_menu.restart_button.clicked = False
+            self.end_game()
+            self.show_main_menu()
+
+        elif sudoku_menu.exit_button.clicked:
+            self.quit()
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            clicked_cell = board.click(event.pos[1], event.pos[0])
+            if clicked_cell is not None:
+                board.select(clicked_cell[0], clicked_cell[1])
+
+        elif event.type == pygame.KEYDOWN:
+            self.board_key(event.key, event.mod)
+
+        if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONUP) and self.scene == 'sudoku board':
+            self.autosave()
+
+    def board_key(self, key, mod=0):
+        board = self.sudoku_menu.board
+        if board.selected_cell is None:
+            board.select(board.size // 2, board.size // 2)
+        cell = board.selected_cell
+
+        # Arrow keys move the selection
+        moves = {
+            pygame.K_UP: (-1, 0),
+            pygame.K_DOWN: (1, 0),
+            pygame.K_LEFT: (0, -1),
+            pygame.K_RIGHT: (0, 1),
+        }
+        if key in moves:
+            d_row, d_col = moves[key]
+            board.select(cell.row + d_row, cell.col + d_col)
+
+        elif key == pygame.K_RETURN:
+            # Enter turns the sketched value into the cell's value
+            if board.commit_sketch() and board.is_full():
+                self.show_game_over(board.check_board())
+
+        elif key == pygame.K_F1:
+            # F1 pencils in every possible value, F2 turns automatic mark removal on and off
+            board.fill_marks()
+
+        elif key == pygame.K_F2:
+            board.auto_eliminate = not board.auto_eliminate
+
+        elif mod & pygame.KMOD_CTRL and key in (pygame.K_z, pygame.K_y):
+            # Ctrl+Z undoes the last move, Ctrl+Y or Ctrl+Shift+Z redoes it
+            if key == pygame.K_y or mod & pygame.KMOD_SHIFT:
+                board.redo()
+            else:
+                board.undo()
+
+        elif key == pygame.K_F3:
+            # F3 asks for a hint: its cell is selected and the value sketched in
+            step = board.hint()
+            if step is not None:
+                board.select(*divmod(step.cell, board.size))
+                if board.selected_cell.value == 0:
+                    board.sketch(step.digit)
+
+        elif key_value(key, board.size) is not None:
+            # Shift + value turns a pencil mark on or off, the value alone sketches it
+            if mod & pygame.KMOD_SHIFT:
+                board.toggle_mark(key_value(key, board.size))
+            elif cell.value == 0:
+                board.sketch(key_value(key, board.size))
+
+    def game_over_event(self, event):
+        button = self.game_over_menu.button
+        button.process(event)
+        if button.clicked:
+            button.clicked = False
+            if self.game_over_menu.user_won:
+                # Exit button
+                self.quit()
+            # Restart button
+            self.show_main_menu()
+
+    ##### SAVING #####
+
+    def elapsed(self):
+        # Seconds played on the current game, over every session
+        return self.played + time.monotonic() - self.started
+
+    def snapshot(self):
+        board = self.sudoku_menu.board
+        selected = board.selected_cell.index if board.selected_cell is not None else None
+        return snapshot(board.state, self.sudoku_menu.difficulty, board.puzzle_id, selected,
+                        self.elapsed(), board.auto_eliminate)
+
+    def autosave(self):
+        # Hand the autosaver the board as it is now; it decides when to write it
+        if self.autosaver is not None:
+            self.autosaver.offer(self.snapshot())
+
+    def end_game(self):
+        # The game was won, lost or given up, so there is nothing to come back to
+        if self.autosaver is not None:
+            self.autosaver.discard()
+
+    def quit(self):
+        # Save a game in progress before closing, so the next start carries on with it
+        if self.autosaver is not None:
+            if self.scene == 'sudoku board':
+                self.autosave()
+            self.autosaver.stop()
+            self.autosaver.flush()
+        # Leave the numbers behind for bug reports
+        if metrics.enabled:
+            metrics.export(METRICS_PATH)
+        pygame.quit()
+        sys.exit()
+
+    ##### MAIN LOOP #####
+
+    def toggle_hud(self):
+        # Metrics stay on once the HUD has been opened, so it has numbers when it comes back
+        self.show_hud = not self.show_hud
+        if self.show_hud:
+            metrics.enable()
+        else:
+            self.hud.hide()
+
+    def render(self):
+        # Repaint only the cells that changed, then send just the changed areas to the display
+        if self.scene == 'sudoku board':
+            dirty_regions.add_all(self.sudoku_menu.board.draw_dirty())
+        if self.show_hud:
+            self.hud.render(self.fps_clock.get_fps())
+        dirty_regions.flush()
+
+    def run(self):
+        while True:
+            # Sleep until something happens, then take everything that is queued
+            events = [pygame.event.wait()]
+            events.extend(pygame.event.get())
+
+            # A frame is the work done for one batch of events, not the time spent waiting for it
+            with metrics.timer("frame"):
+                for event in events:
+                    if event.type == pygame.QUIT:
+                        self.quit()
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                        self.toggle_hud()
+                        continue
+                    with metrics.timer("event"):
+                        self.scenes[self.scene](event)
+
+                self.render()
+            self.fps_clock.tick(self.fps)
+
+
 def main():
     pygame.init()
 
-    fps = 60
-    fps_clock = pygame.time.Clock()
-
     # Initialize the screen
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
 
-    menu = Menu(screen)
-    menu.current_menu = 'main menu'
-
-    # Define other menus
-    main_menu = MainMenu(screen)
-    main_menu.render()
-
-    sudoku_menu = SudokuMenu(screen, difficulty=None)
-    game_over_menu = GameOverMenu(screen, user_won=None)
-
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            '''
-            Detects if a button in the current menu is being pressed, hovered over, or neither.
-            '''
-
-            if menu.current_menu == 'main menu':
-                main_menu.easy_button.process(event)
-                main_menu.medium_button.process(event)
-                main_menu.hard_button.process(event)
-
-            elif menu.current_menu == 'sudoku board':
-                sudoku_menu.reset_button.process(event)
-                sudoku_menu.restart_button.process(event)
-                sudoku_menu.exit_button.process(event)
-
-            elif menu.current_menu == 'game over win':
-                game_over_menu.user_won = True
-                game_over_menu.button.process(event)
-            
-            elif menu.current_menu == 'game over lose':
-                game_over_menu.user_won = False
-                game_over_menu.button.process(event)
-            
-            # """
-            #       LOGIC FOR ALL MENUS
-            #
-            #       Each nested if statement ensures that if a button is clicked once, it is run once.
-            # """
-        # Main menu logic
-            if menu.current_menu == "main menu":
-                # Check if user clicked easy, medium, or hard button
-                if main_menu.easy_button.clicked == True:
-                    main_menu.easy_button.clicked = False
-    
-                    # Switch to Sudoku board and set difficulty to 'EASY'
-                    menu.reset_screen()
-                    menu.current_menu = 'sudoku board'
-                    sudoku_menu.difficulty = 'EASY'
-                    sudoku_menu.render_board()
-                    sudoku_menu.render_menu()
-    
-                elif main_menu.medium_button.clicked == True:
-                    main_menu.medium_button.clicked = False
-                    
-                    # Switch to Sudoku board and set difficulty to 'MEDIUM'
-                    menu.reset_screen()
-                    menu.current_menu = 'sudoku board'
-                    sudoku_menu.difficulty = 'MEDIUM'
-                    sudoku_menu.render_board()
-                    sudoku_menu.render_menu()
-    
-                elif main_menu.hard_button.clicked == True:
-                    main_menu.hard_button.clicked = False
-    
-                    # Switch to Sudoku board and set difficulty to 'HARD'
-                    menu.reset_screen()
-                    menu.current_menu = 'sudoku board'
-                    sudoku_menu.difficulty = 'HARD'
-                    sudoku_menu.render_board()
-                    sudoku_menu.render_menu()
-    
-            # Sudoku board
-            elif menu.current_menu == 'sudoku board':
-                
-                if sudoku_menu.reset_button.clicked == True:
-                    sudoku_menu.board.reset_to_original()
-                    sudoku_menu.board.screen.fill(BG_COLOR)
-                    sudoku_menu.board.draw()
-                    sudoku_menu.reset_button.clicked = False   
-    
-                elif sudoku_menu.restart_button.clicked == True:
-                    # Take user back to main menu
-                    menu.reset_screen()
-                    menu.current_menu = 'main menu'
-                    main_menu.render()
-                    sudoku_menu.restart_button_clicked = False
-                
-                elif sudoku_menu.exit_button.clicked == True:
-                    sys.exit()
-                    
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if sudoku_menu.board.selected_cell is not None:
-                        sudoku_menu.board.selected_cell.erase()
-                        sudoku_menu.board.drawgrid()
-                    if sudoku_menu.board.click(pygame.mouse.get_pos()[1], pygame.mouse.get_pos()[0]) is not None:
-                        sudoku_menu.board.select(sudoku_menu.board.click(pygame.mouse.get_pos()[1], pygame.mouse.get_pos()[0])[0],sudoku_menu.board.click(pygame.mouse.get_pos()[1], pygame.mouse.get_pos()[0])[1])
-    
-                        
-                elif event.type == pygame.KEYDOWN:
-                    if sudoku_menu.board.selected_cell is None:
-                        sudoku_menu.board.select(4, 4)
-                    
-    
-                    if event.key == pygame.K_UP:
-                        sudoku_menu.board.selected_cell.erase()
-                        sudoku_menu.board.selected_cell.selected = False
-                        menu.reset_screen()
-                        sudoku_menu.board.drawgrid()
-                        sudoku_menu.board.select(sudoku_menu.board.selected_cell.row - 1, sudoku_menu.board.selected_cell.col)
-                        
-                    elif event.key == pygame.K_DOWN:
-                        sudoku_menu.board.selected_cell.erase()
-                        sudoku_menu.board.selected_cell.selected = False
-                        menu.reset_screen()
-                        sudoku_menu.board.drawgrid()
-                        sudoku_menu.board.select(sudoku_menu.board.selected_cell.row + 1, sudoku_menu.board.selected_cell.col)
-                    
-                    elif event.key == pygame.K_LEFT:
-                        sudoku_menu.board.selected_cell.erase()
-                        sudoku_menu.board.selected_cell.selected = False
-                        menu.reset_screen()
-                        sudoku_menu.board.drawgrid()
-                        sudoku_menu.board.select(sudoku_menu.board.selected_cell.row, sudoku_menu.board.selected_cell.col - 1)
-                    
-                    elif event.key == pygame.K_RIGHT:
-                        sudoku_menu.board.selected_cell.erase()
-                        sudoku_menu.board.selected_cell.selected = False
-                        menu.reset_screen()
-                        sudoku_menu.board.drawgrid()
-                        sudoku_menu.board.select(sudoku_menu.board.selected_cell.row, sudoku_menu.board.selected_cell.col + 1)
-                        
-                    elif event.key == pygame.K_RETURN:
-                        if sudoku_menu.board.selected_cell is not None:
-                            if sudoku_menu.board.selected_cell.value == 0:
-                                if sudoku_menu.board.selected_cell.sketched_value != 0:
-                                    sudoku_menu.board.selected_cell.value = sudoku_menu.board.selected_cell.sketched_value
-                                    sudoku_menu.board.selected_cell.sketched_value = 0
-                                    menu.reset_screen()
-                                    sudoku_menu.board.draw()
-                                    if sudoku_menu.board.is_full():
-                                        if sudoku_menu.board.check_board():
-                                            menu.current_menu = 'game over win'
-                                            menu.reset_screen()
-                                            game_over_menu = GameOverMenu(screen, True)
-                                            game_over_menu.render()
-                                        else:
-                                            menu.current_menu = 'game over lose'
-                                            menu.reset_screen()
-                                            game_over_menu = GameOverMenu(screen, False)
-                                            game_over_menu.render()
-                                    
-                    elif event.key in [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4, pygame.K_5,
-                                       pygame.K_6, pygame.K_7, pygame.K_8, pygame.K_9]:
-                        if sudoku_menu.board.selected_cell is not None:
-                            if sudoku_menu.board.selected_cell.value == 0:
-                                char = chr(event.key)
-                                sudoku_menu.board.sketch(int(char))
-                                menu.reset_screen()
-                                sudoku_menu.board.draw()
-                                
-
-                    
-
-            # Game over (win screen) logic
-            elif menu.current_menu == 'game over win':
-                # Check if user presses exit button
-                if game_over_menu.button.clicked == True:
-                    sys.exit()
-            
-            
-            # Game over (lose screen) logic
-            elif menu.current_menu == 'game over lose':
-                # Check if user presses restart button
-                if game_over_menu.button.clicked == True:
-                    # Render main menu
-                    menu.reset_screen()
-                    menu.current_menu = 'main menu'
-                    main_menu.render()
-                    game_over_menu.clicked = False
-                
-            pygame.display.flip()
-            fps_clock.tick(fps)
+    # Draw puzzles from the precomputed bank when one has been built. Otherwise
+    # generate them in the background so clicking a difficulty does not stall
+    puzzle_source = None
+    if os.path.exists(PUZZLE_BANK_PATH):
+        try:
+            puzzle_source = PuzzleBank(PUZZLE_BANK_PATH)
+        except ValueError as error:
+            print(f"Ignoring {PUZZLE_BANK_PATH}: {error}")
+    if puzzle_source is None:
+        puzzle_source = PuzzlePool().start()
+
+    if METRICS_ENABLED:
+        metrics.enable()
+
+    game = Game(screen, puzzle_source, autosaver=Autosaver(SAVE_PATH).start())
+
+    # Carry on with the game left open last time, if there is one
+    try:
+        saved = read_save(SAVE_PATH)
+    except ValueError as error:
+        print(f"Ignoring {SAVE_PATH}: {error}")
+        saved = None
+    if saved is not None:
+        game.resume(saved)
+    game.render()
+    game.run()
 
 if __name__ == '__main__':
     main()
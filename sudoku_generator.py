@@ -1,5 +1,11 @@
 import math, random
 
+import solver
+from metrics import metrics
+
+# Largest search has_other_solution_large will run before giving up on a removal
+SEARCH_STEPS = 100
+
 """
 This was adapted from a GeeksforGeeks article "Program for Sudoku Generator" by Aarti_Rathi and Ankur Trisal
 https://www.geeksforgeeks.org/program-sudoku-generator/
@@ -15,21 +21,41 @@ class SudokuGenerator:
 	self.removed_cells	- the total number of cells to be removed
 	self.board			- a 2D list of ints to represent the board
 	self.box_length		- the square root of row_length
+	self.row_used		- bitmask per row of the digits already placed in that row
+	self.col_used		- bitmask per column of the digits already placed in that column
+	self.box_used		- bitmask per box of the digits already placed in that box
+	self.box_of			- 2D list giving the box index of each cell
+	self.unique			- whether remove_cells must keep the solution unique
+	self.backtracks		- number of times fill_remaining had to undo a placement
+	self.rng			- the random.Random behind every random choice, so a seeded rng always gives the same board
 
 	Parameters:
-    row_length is the number of rows/columns of the board (always 9 for this project)
+    row_length is the number of rows/columns of the board (a perfect square: 9, 16, 25, ...)
     removed_cells is an integer value - the number of cells to be removed
+    unique is a boolean - if True, only removals that leave exactly one solution are kept
+    rng is an optional random.Random (default: a new one seeded from the OS)
 
 	Return:
 	None
     '''
 
-    def __init__(self, row_length, removed_cells):
+    def __init__(self, row_length, removed_cells, unique=False, rng=None):
         self.row_length = row_length
         self.removed_cells = removed_cells
-        self.board = [[0 for i in range(9)] for i in range(9)]
+        self.unique = unique
+        self.rng = rng if rng is not None else random.Random()
+        self.backtracks = 0
+        self.board = [[0 for i in range(self.row_length)] for i in range(self.row_length)]
         self.box_length = int(self.row_length ** .5)
 
+        # Bit (num - 1) is set when num is already used in that row/column/box
+        self.row_used = [0] * self.row_length
+        self.col_used = [0] * self.row_length
+        self.box_used = [0] * self.row_length
+        self.all_digits = (1 << self.row_length) - 1
+        self.box_of = [[self.box_index(row, col) for col in range(self.row_length)]
+                       for row in range(self.row_length)]
+
     '''
 	Returns a 2D python list of numbers which represents the board
 
@@ -120,8 +146,91 @@ class SudokuGenerator:
     '''
 
     def is_valid(self, row, col, num):
-        row_start, col_start = row - row%3, col - col%3
-        return self.valid_in_row(row, num) and self.valid_in_col(col, num) and self.valid_in_box(row_start, col_start, num)
+        bit = 1 << (num - 1)
+        used = self.row_used[row] | self.col_used[col] | self.box_used[self.box_of[row][col]]
+        return not used & bit
+
+    '''
+    Returns the index of the box containing (row, col)
+    Boxes are numbered left to right, top to bottom
+
+	Parameters:
+	row and col are the row index and col index of the cell
+
+	Return: int
+    '''
+
+    def box_index(self, row, col):
+        return row // self.box_length * self.box_length + col // self.box_length
+
+    '''
+    Puts num at (row, col) and marks it as used in the row, column and box masks
+    Every write of a nonzero value to the board should go through this method
+
+	Parameters:
+	row and col are the row index and col index of the cell
+	num is the value to place
+
+	Return: None
+    '''
+
+    def place(self, row, col, num):
+        bit = 1 << (num - 1)
+        self.board[row][col] = num
+        self.row_used[row] |= bit
+        self.col_used[col] |= bit
+        self.box_used[self.box_of[row][col]] |= bit
+
+    '''
+    Clears (row, col) and unmarks its value in the row, column and box masks
+
+	Parameters:
+	row and col are the row index and col index of the cell
+
+	Return: None
+    '''
+
+    def unplace(self, row, col):
+        num = self.board[row][col]
+        if num == 0:
+            return
+        bit = ~(1 << (num - 1))
+        self.board[row][col] = 0
+        self.row_used[row] &= bit
+        self.col_used[col] &= bit
+        self.box_used[self.box_of[row][col]] &= bit
+
+    '''
+    Returns the bitmask of values that can still be entered at (row, col)
+    Bit (num - 1) is set when num is valid there
+
+	Parameters:
+	row and col are the row index and col index of the cell
+
+	Return: int
+    '''
+
+    def candidate_mask(self, row, col):
+        used = self.row_used[row] | self.col_used[col] | self.box_used[self.box_of[row][col]]
+        return self.all_digits & ~used
+
+    '''
+    Returns the values that can still be entered at (row, col), in increasing order
+
+	Parameters:
+	row and col are the row index and col index of the cell
+
+	Return: list[int]
+    '''
+
+    def candidates(self, row, col):
+        mask = self.candidate_mask(row, col)
+        nums = []
+        while mask:
+            low = mask & -mask
+            nums.append(low.bit_length())
+            mask ^= low
+        return nums
 
     '''
     Fills the specified 3x3 box with values
@@ -139,8 +248,8 @@ class SudokuGenerator:
         for i in range(row_start, row_start + self.box_length):
             for j in range(col_start, col_start + self.box_length):
                     length = int(len(nums))+1
-                    num = nums.pop(random.randrange(length)-1)
-                    self.board[i][j] = num
+                    num = nums.pop(self.rng.randrange(length)-1)
+                    self.place(i, j, num)
 
     '''
     Fills the three boxes along the main diagonal of the board
@@ -151,9 +260,8 @@ class SudokuGenerator:
     '''
 
     def fill_diagonal(self):
-        self.fill_box(0, 0)
-        self.fill_box(3, 3)
-        self.fill_box(6, 6)
+        for start in range(0, self.row_length, self.box_length):
+            self.fill_box(start, start)
 
     '''
     DO NOT CHANGE
@@ -187,14 +295,50 @@ class SudokuGenerator:
                 if row >= self.row_length:
                     return True
 
-        for num in range(1, self.row_length + 1):
-            if self.is_valid(row, col, num):
-                self.board[row][col] = num
-                if self.fill_remaining(row, col + 1):
-                    return True
-                self.board[row][col] = 0
+        for num in self.candidates(row, col):
+            self.place(row, col, num)
+            if self.fill_remaining(row, col + 1):
+                return True
+            self.unplace(row, col)
+            self.backtracks += 1
         return False
 
+    '''
+    Version of has_other_solution for 16x16 and larger boards
+    Uses the exact-cover solver, whose constraint choice also catches hidden singles.
+    A search that needs more than SEARCH_STEPS steps counts as "not unique", so a
+    hard-to-decide removal is undone instead of stalling generation.
+
+	Parameters: None
+	Return: boolean
+    '''
+
+    def has_other_solution_large(self):
+        try:
+            return solver.count_solutions(self.board, 2, max_steps=SEARCH_STEPS) > 1
+        except solver.SearchLimitExceeded:
+            return True
+
+    '''
+    Fills every empty cell using the exact-cover solver in solver.py
+    Can be used in place of fill_remaining; unlike fill_remaining it does not rely
+    on the diagonal boxes being the only filled cells
+
+	Parameters: None
+	Return:
+	boolean (whether or not we could solve the board)
+    '''
+
+    def solve_remaining(self):
+        solution = solver.solve(self.board)
+        if solution is None:
+            return False
+        for row in range(self.row_length):
+            for col in range(self.row_length):
+                if self.board[row][col] == 0:
+                    self.place(row, col, solution[row][col])
+        return True
+
     '''
     DO NOT CHANGE
     Provided for students
@@ -205,14 +349,80 @@ class SudokuGenerator:
     '''
 
     def fill_values(self):
-        self.fill_diagonal()
-        self.fill_remaining(0, self.box_length)
+        with metrics.timer("generate.fill_diagonal"):
+            self.fill_diagonal()
+        if self.box_length <= 3:
+            with metrics.timer("generate.fill_remaining"):
+                self.fill_remaining(0, self.box_length)
+            metrics.count("generate.backtracks", self.backtracks)
+        else:
+            # fill_remaining takes far too long to backtrack on 16x16 and larger boards
+            with metrics.timer("generate.solve_remaining"):
+                self.solve_remaining()
+
+    '''
+    Counts the solutions of the current board, stopping as soon as limit is reached
+    Always branches on the empty cell with the fewest candidates, so most boards
+    are decided after a handful of guesses. The board is left unchanged.
+
+	Parameters:
+	limit is the number of solutions after which counting stops (2 is enough to test uniqueness)
+
+	Return: int (the number of solutions found, at most limit)
+    '''
+
+    def count_solutions(self, limit=2):
+        empties = [(row, col) for row in range(self.row_length) for col in range(self.row_length)
+                   if self.board[row][col] == 0]
+        return self.count_from(empties, limit)
+
+    '''
+    Recursive helper for count_solutions
+
+	Parameters:
+	empties is a list of (row, col) tuples for the cells that are still empty
+	limit is the number of solutions after which counting stops
+
+	Return: int
+    '''
+
+    def count_from(self, empties, limit):
+        if not empties:
+            return 1
+
+        # Pick the most constrained cell; give up early on a dead end
+        best = 0
+        best_mask = 0
+        best_count = self.row_length + 1
+        for i, (row, col) in enumerate(empties):
+            mask = self.candidate_mask(row, col)
+            count = bin(mask).count("1")
+            if count < best_count:
+                best, best_mask, best_count = i, mask, count
+                if count <= 1:
+                    break
+        if best_count == 0:
+            return 0
+
+        row, col = empties[best]
+        rest = empties[:best] + empties[best + 1:]
+        found = 0
+        while best_mask:
+            low = best_mask & -best_mask
+            best_mask ^= low
+            self.place(row, col, low.bit_length())
+            found += self.count_from(rest, limit - found)
+            self.unplace(row, col)
+            if found >= limit:
+                break
+        return found
 
     '''
     Removes the appropriate number of cells from the board
     This is done by setting some values to 0
     Should be called after the entire solution has been constructed
     i.e. after fill_values has been called
+    If self.unique is set, remove_unique_cells is used instead
 
     NOTE: Be careful not to 'remove' the same cell multiple times
     i.e. if a cell is already 0, it cannot be removed again
@@ -222,14 +432,70 @@ class SudokuGenerator:
     '''
 
     def remove_cells(self):
+        if self.unique:
+            self.remove_unique_cells()
+            return
         count = self.removed_cells
         while count > 0:
-            row = random.randrange(0, self.row_length)
-            col = random.randrange(0, self.row_length)
+            row = self.rng.randrange(0, self.row_length)
+            col = self.rng.randrange(0, self.row_length)
             if self.board[row][col] != 0:
-                self.board[row][col] = 0
+                self.unplace(row, col)
                 count -= 1
 
+    '''
+    Removes cells in random order, keeping a removal only if the puzzle still has exactly one solution
+    A removal is undone as soon as any other value fits the blanked cell, so each check
+    only has to find one alternative solution rather than count all of them.
+    If no more cells can be removed, fewer than removed_cells cells may end up blank.
+
+	Parameters: None
+	Return: int (the number of cells actually removed)
+    '''
+
+    def remove_unique_cells(self):
+        cells = [(row, col) for row in range(self.row_length) for col in range(self.row_length)]
+        self.rng.shuffle(cells)
+        removed = 0
+        for row, col in cells:
+            if removed == self.removed_cells:
+                break
+            num = self.board[row][col]
+            if num == 0:
+                continue
+            self.unplace(row, col)
+            if self.has_other_solution(row, col, num):
+                self.place(row, col, num)
+            else:
+                removed += 1
+        return removed
+
+    '''
+    Determines if the board can be solved with something other than num at (row, col)
+    The board is left unchanged.
+
+	Parameters:
+	row and col are the row index and col index of an empty cell
+	num is the value that the known solution has at (row, col)
+
+	Return: boolean
+    '''
+
+    def has_other_solution(self, row, col, num):
+        if self.box_length > 3:
+            return self.has_other_solution_large()
+        empties = [(r, c) for r in range(self.row_length) for c in range(self.row_length)
+                   if self.board[r][c] == 0 and (r, c) != (row, col)]
+        mask = self.candidate_mask(row, col) & ~(1 << (num - 1))
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            self.place(row, col, low.bit_length())
+            found = self.count_from(empties, 1)
+            self.unplace(row, col)
+            if found:
+                return True
+        return False
 
 
 '''
@@ -242,19 +508,23 @@ Given a number of rows and number of cells to remove, this function:
 4. returns the representative 2D Python Lists of the board and solution
 
 Parameters:
-size is the number of rows/columns of the board (9 for this project)
+size is the number of rows/columns of the board (9, 16, 25, ...)
 removed is the number of cells to clear (set to 0)
+unique is whether the puzzle must keep exactly one solution (see SudokuGenerator.remove_unique_cells)
+seed is optional; the same size, removed, unique and seed always give the same board and solution
 
 Return: list[list] (a 2D Python list to represent the board)
 '''
 
 
-def generate_sudoku(size, removed):
-    sudoku = SudokuGenerator(size, removed)
-    sudoku.fill_values()
-    solvedboard = [[cell for cell in row] for row in sudoku.get_board()]
-    sudoku.remove_cells()
-    board = sudoku.get_board()
+def generate_sudoku(size, removed, unique=False, seed=None):
+    with metrics.timer("generate"):
+        sudoku = SudokuGenerator(size, removed, unique, random.Random(seed))
+        sudoku.fill_values()
+        solvedboard = [[cell for cell in row] for row in sudoku.get_board()]
+        with metrics.timer("generate.remove_cells"):
+            sudoku.remove_cells()
+        board = sudoku.get_board()
     #for row in solvedboard:
     #    for cell in row:
     #        print(cell, end=' ')
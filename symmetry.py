@@ -0,0 +1,206 @@
+'''
+Sudoku symmetries and a canonical form for 9x9 grids
+
+These changes turn a valid grid into another valid grid with the same
+difficulty, so puzzles that differ only by them are the same puzzle in disguise:
+
+    - relabeling the digits
+    - reordering the rows within a band, or the bands themselves
+    - reordering the columns within a stack, or the stacks themselves
+    - transposing
+
+canonical_form(grid) picks one representative of all 3,359,232 row/column
+arrangements (times every relabeling): the smallest one read row by row, with
+0 (empty) smallest and the digits relabeled 1, 2, 3, ... in order of first
+appearance. Two grids have the same canonical form exactly when one can be
+turned into the other.
+
+Works on puzzles and full grids alike, given as 2D lists or as flat sequences
+of 81 values. Full grids have far more ties to break and take longer.
+
+random_symmetry() picks one of the symmetries at random, for disguising a
+puzzle (see variants.py).
+'''
+
+import functools
+import itertools
+import random
+
+SIZE = 9
+BOX = 3
+
+# Every order of the 9 rows (or columns) that keeps bands (stacks) together:
+# LINE_PERMS[k][i] is the original line that ends up at position i
+LINE_PERMS = tuple(
+    tuple(order[k] * BOX + inner[k][i] for k in range(BOX) for i in range(BOX))
+    for order in itertools.permutations(range(BOX))
+    for inner in itertools.product(itertools.permutations(range(BOX)), repeat=BOX)
+)
+
+
+def flatten(grid):
+    # 2D list or flat sequence -> tuple of 81 values
+    if len(grid) == SIZE:
+        return tuple(num for row in grid for num in row)
+    if len(grid) != SIZE * SIZE:
+        raise ValueError(f"expected a 9x9 grid, got {len(grid)} values")
+    return tuple(grid)
+
+
+def transpose(cells):
+    return tuple(cells[c * SIZE + r] for r in range(SIZE) for c in range(SIZE))
+
+
+def random_symmetry(rng=random):
+    '''
+    A uniformly random symmetry as (transposed, rows, cols, digits), the arguments of transform
+    Rotations and reflections are among them: a quarter turn is a transpose
+    followed by reversing the column order.
+    '''
+    digits = list(range(1, SIZE + 1))
+    rng.shuffle(digits)
+    return rng.random() < 0.5, rng.choice(LINE_PERMS), rng.choice(LINE_PERMS), [0] + digits
+
+
+def source_cells(transposed, rows, cols):
+    '''
+    Flat index of the original cell that transform moves to each flat index of the result
+    '''
+    if transposed:
+        return [c * SIZE + r for r in rows for c in cols]
+    return [r * SIZE + c for r in rows for c in cols]
+
+
+def transform(grid, transposed=False, rows=tuple(range(SIZE)), cols=tuple(range(SIZE)), digits=None):
+    '''
+    Apply one symmetry to grid and return the result as a 2D list
+
+    Parameters:
+        transposed: transpose first
+        rows, cols: line orders from LINE_PERMS; row i of the result is row rows[i]
+        digits: relabeling, digits[v] is the new value of v (index 0 must stay 0)
+    '''
+    cells = flatten(grid)
+    if digits is None:
+        digits = range(SIZE + 1)
+    moved = [digits[cells[i]] for i in source_cells(transposed, rows, cols)]
+    return [moved[r * SIZE:(r + 1) * SIZE] for r in range(SIZE)]
+
+
+@functools.lru_cache(maxsize=None)
+def best_first_rows(mask):
+    '''
+    Column orders that make a row with givens at mask (bit c = column c) as small as possible
+
+    A row always relabels to 1, 2, 3, ... in reading order, so the best first
+    row only depends on where its empty cells are: as many leading zeros as possible.
+
+    Returns:
+        (pattern, orders) where pattern is the smallest given-mask the row can be
+        moved to (bit 8 = first column) and orders are the LINE_PERMS giving it
+    '''
+    best = None
+    orders = []
+    for perm in LINE_PERMS:
+        pattern = 0
+        for c in perm:
+            pattern = pattern << 1 | (mask >> c & 1)
+        if best is None or pattern < best:
+            best = pattern
+            orders = [perm]
+        elif pattern == best:
+            orders.append(perm)
+    return best, tuple(orders)
+
+
+def relabel_row(row, perm, labels, next_label):
+    '''
+    Read row in column order perm, relabeling digits in order of first appearance
+
+    labels is changed in place. Returns (values, next_label).
+    '''
+    out = []
+    for c in perm:
+        num = row[c]
+        if num:
+            label = labels[num]
+            if not label:
+                next_label += 1
+                label = labels[num] = next_label
+            out.append(label)
+        else:
+            out.append(0)
+    return tuple(out), next_label
+
+
+def canonical_cells(grid):
+    '''
+    The canonical form of grid as a tuple of 81 values (see the module docstring)
+
+    Builds the result one row at a time, keeping every partial arrangement that
+    ties for the smallest rows so far (a beam search). The first row is looked
+    up from its given-mask, and the later rows narrow the ties down quickly.
+    '''
+    cells = flatten(grid)
+
+    # A state is (rows of its variant, column order, labels, next label,
+    # rows left in the current band, bands not used yet)
+    best = None
+    first_row = None
+    states = []
+    for variant in (cells, transpose(cells)):
+        rows = tuple(variant[r * SIZE:(r + 1) * SIZE] for r in range(SIZE))
+        for r, row in enumerate(rows):
+            mask = 0
+            for c, num in enumerate(row):
+                if num:
+                    mask |= 1 << c
+            pattern, orders = best_first_rows(mask)
+            if best is not None and pattern > best:
+                continue
+            if best is None or pattern < best:
+                best = pattern
+                states = []
+            band = r // BOX
+            rest = tuple(band * BOX + i for i in range(BOX) if band * BOX + i != r)
+            bands = tuple(b for b in range(BOX) if b != band)
+            for perm in orders:
+                labels = [0] * (SIZE + 1)
+                first_row, next_label = relabel_row(row, perm, labels, 0)
+                states.append((rows, perm, labels, next_label, rest, bands))
+
+    output = []
+    for level in range(SIZE):
+        if level == 0:
+            # Every first-row state reads the same: the best pattern with labels 1, 2, 3, ...
+            output.extend(first_row)
+            continue
+        best_row = None
+        next_states = []
+        for rows, perm, labels, next_label, rest, bands in states:
+            if rest:
+                choices = [(r, tuple(x for x in rest if x != r), bands) for r in rest]
+            else:
+                choices = [(b * BOX + i,
+                            tuple(b * BOX + j for j in range(BOX) if j != i),
+                            tuple(x for x in bands if x != b))
+                           for b in bands for i in range(BOX)]
+            for r, new_rest, new_bands in choices:
+                new_labels = list(labels)
+                values, new_next = relabel_row(rows[r], perm, new_labels, next_label)
+                if best_row is not None and values > best_row:
+                    continue
+                if best_row is None or values < best_row:
+                    best_row = values
+                    next_states = []
+                next_states.append((rows, perm, new_labels, new_next, new_rest, new_bands))
+        output.extend(best_row)
+        states = next_states
+    return tuple(output)
+
+
+def canonical_form(grid):
+    '''
+    The canonical form of grid as an 81-character string, "0" for empty cells
+    '''
+    return "".join(map(str, canonical_cells(grid)))
@@ -0,0 +1,21 @@
+import random
+
+import pytest
+
+import solver
+from constants import DIFFICULTY_CELLS
+from variants import VariantPool
+
+
+def test_generate_fills_every_difficulty():
+    variants = VariantPool.generate(2, seed=7, rng=random.Random(7))
+    for difficulty in DIFFICULTY_CELLS:
+        assert variants.ready(difficulty) >= 2
+        board, solution, trace = variants.get(difficulty)
+        assert solver.is_solution(solution)
+        assert all(num in (0, solution[r][c]) for r, row in enumerate(board) for c, num in enumerate(row))
+
+
+def test_generate_gives_up_after_max_attempts():
+    with pytest.raises(RuntimeError):
+        VariantPool.generate(5, seed=7, max_attempts=3)
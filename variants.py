@@ -0,0 +1,143 @@
+'''
+Instant puzzles made by disguising a small pool of verified seed puzzles
+
+Relabeling digits, reordering rows/columns within bands/stacks, reordering
+bands/stacks, transposing and rotating all keep a puzzle valid, keep its
+solution unique and need exactly the same solving techniques. So once a seed
+puzzle has been checked and graded, every random symmetry of it (see
+symmetry.py) is a new, already rated puzzle. Making one only moves 81 cells
+around, which takes microseconds instead of the milliseconds generate_sudoku
+needs.
+
+The clue mask, the solution and the grader trace used for hints are all moved
+along with the puzzle.
+
+Example:
+    variants = VariantPool.generate(20)      # or VariantPool(pairs) with known puzzles
+    board, solution, trace = variants.get("HARD")
+    board = Board(width, height, screen, "HARD", variants)
+'''
+
+import random
+
+import solver
+from constants import DIFFICULTY_CELLS
+from grader import Step, difficulty_for, grade
+from symmetry import SIZE, random_symmetry, source_cells
+from sudoku_generator import generate_sudoku
+
+# About as many cells as can be blanked with the solution kept unique; asking for more only costs time
+MAX_REMOVED = 64
+# Extra cells blanked for a difficulty each time a seed made for it grades easier
+REMOVE_STEP = 5
+# generate gives up after this many puzzles per seed it was asked for
+ATTEMPTS_PER_SEED = 50
+
+
+class VariantPool:
+    '''
+    Parameters:
+        seeds: iterable of 9x9 (board, solution) pairs; each one is verified and graded
+        rng: random.Random used to pick seeds and symmetries (default: a new unseeded one)
+    '''
+
+    def __init__(self, seeds=(), rng=None):
+        self.rng = rng if rng is not None else random.Random()
+        # difficulty -> list of (flat board, flat solution, trace) for seeds graded at that difficulty
+        self.seeds = {name: [] for name in DIFFICULTY_CELLS}
+        for board, solution in seeds:
+            self.add(board, solution)
+
+    @classmethod
+    def generate(cls, count, seed=None, rng=None, max_attempts=None):
+        '''
+        Build a pool with at least count freshly generated seeds for every difficulty
+
+        Seeds land under the difficulty the grader gives them, and puzzles made
+        with the removed-cell counts of DIFFICULTY_CELLS mostly grade EASY. So
+        puzzles are made for whichever difficulties are still short, with
+        REMOVE_STEP more cells blanked each time one grades easier than intended.
+
+        Raises:
+            RuntimeError if a difficulty is still short after max_attempts puzzles
+            (default: ATTEMPTS_PER_SEED for every seed asked for)
+        '''
+        if max_attempts is None:
+            max_attempts = ATTEMPTS_PER_SEED * count * len(DIFFICULTY_CELLS)
+        pool = cls(rng=rng)
+        seeds = random.Random(seed)
+        order = list(DIFFICULTY_CELLS)
+        removed = dict(DIFFICULTY_CELLS)
+        attempts = 0
+        while True:
+            short = [name for name in order if pool.ready(name) < count]
+            if not short:
+                return pool
+            if attempts == max_attempts:
+                raise RuntimeError(f"no {count} {'/'.join(short)} seed puzzles after {attempts} tries")
+            target = short[attempts % len(short)]
+            attempts += 1
+            board, solution = generate_sudoku(SIZE, removed[target], unique=True, seed=seeds.getrandbits(64))
+            if order.index(pool.add(board, solution)) < order.index(target):
+                removed[target] = min(MAX_REMOVED, removed[target] + REMOVE_STEP)
+
+    def add(self, board, solution):
+        '''
+        Check and grade one seed puzzle
+
+        Returns:
+            the difficulty it was filed under
+        Raises:
+            ValueError if solution is not a valid full grid, board does not match it
+            or board has more than one solution
+        '''
+        if len(board) != SIZE or len(solution) != SIZE:
+            raise ValueError("only 9x9 puzzles can be used as seeds")
+        if not solver.is_solution(solution):
+            raise ValueError("seed solution is not a valid full grid")
+        cells = tuple(num for row in board for num in row)
+        solved = tuple(num for row in solution for num in row)
+        if any(num and num != solved[i] for i, num in enumerate(cells)):
+            raise ValueError("seed puzzle does not match its solution")
+        if solver.count_solutions(board, 2) != 1:
+            raise ValueError("seed puzzle does not have a unique solution")
+
+        result = grade(board)
+        difficulty = difficulty_for(result.score)
+        self.seeds[difficulty].append((cells, solved, result.trace))
+        return difficulty
+
+    def __len__(self):
+        return sum(len(seeds) for seeds in self.seeds.values())
+
+    def ready(self, difficulty):
+        # Number of seeds variants of difficulty are made from
+        return len(self.seeds.get(difficulty, ()))
+
+    def get(self, difficulty, size=9):
+        '''
+        Return a new (board, solution, trace) for difficulty, or None if there is no seed for it
+        trace is the seed's grader trace moved to the new cells and digits, so it drives hints as is.
+        Only 9x9 puzzles can be made, so any other size gets None.
+        '''
+        seeds = self.seeds.get(difficulty)
+        if not seeds or size != SIZE:
+            return None
+        return self.variant(self.rng.choice(seeds))
+
+    def variant(self, seed):
+        cells, solved, trace = seed
+        transposed, rows, cols, digits = random_symmetry(self.rng)
+        source = source_cells(transposed, rows, cols)
+        board = [digits[cells[i]] for i in source]
+        solution = [digits[solved[i]] for i in source]
+
+        # Where each seed cell ended up, to move the trace along
+        target = [0] * (SIZE * SIZE)
+        for i, old in enumerate(source):
+            target[old] = i
+        moved = [Step(target[step.cell], digits[step.digit], step.technique) for step in trace]
+
+        return ([board[r * SIZE:(r + 1) * SIZE] for r in range(SIZE)],
+                [solution[r * SIZE:(r + 1) * SIZE] for r in range(SIZE)],
+                moved)
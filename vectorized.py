@@ -0,0 +1,139 @@
+'''
+Checks and propagates many grids at once with NumPy
+
+All functions take an (N, n, n) integer array of grids where 0 means empty,
+for example np.array([board for board, solution in puzzles]).
+
+    validate_grids(grids)   -> (N,) bool, True if no row/column/box repeats a value
+    propagate(grids)        -> per-grid valid/solved/stuck flags after singles propagation
+'''
+
+import math
+
+import numpy as np
+
+
+def unit_matrix(n):
+    '''
+    Return a (3n, n*n) bool matrix where row u marks the cells of unit u
+    Units are the n rows, then the n columns, then the n boxes.
+    '''
+    box = math.isqrt(n)
+    cells = np.arange(n * n)
+    rows = cells // n
+    cols = cells % n
+    boxes = rows // box * box + cols // box
+    units = np.zeros((3 * n, n * n), dtype=bool)
+    units[rows, cells] = True
+    units[n + cols, cells] = True
+    units[2 * n + boxes, cells] = True
+    return units
+
+
+def check_shape(grids):
+    grids = np.asarray(grids)
+    if grids.ndim == 2:
+        grids = grids[None]
+    n = grids.shape[-1]
+    if grids.ndim != 3 or grids.shape[1] != n or math.isqrt(n) ** 2 != n:
+        raise ValueError(f"expected an (N, n, n) array with n a perfect square, got shape {grids.shape}")
+    return grids, n
+
+
+def validate_grids(grids):
+    '''
+    Determines, for each grid, if its filled cells follow the Sudoku rules
+
+    A grid is valid when every value is between 0 and n and no row, column or
+    box contains the same nonzero value twice. Empty cells are allowed.
+
+    Returns:
+        (N,) bool array
+    '''
+    grids, n = check_shape(grids)
+    box = math.isqrt(n)
+    in_range = ((grids >= 0) & (grids <= n)).all(axis=(1, 2))
+
+    # onehot[g, r, c, d] is True when grid g has value d + 1 at (r, c)
+    onehot = grids[..., None] == np.arange(1, n + 1, dtype=grids.dtype)
+    row_ok = onehot.sum(axis=2, dtype=np.int16).max(axis=(1, 2)) <= 1
+    col_ok = onehot.sum(axis=1, dtype=np.int16).max(axis=(1, 2)) <= 1
+    boxes = onehot.reshape(len(grids), box, box, box, box, n)
+    box_ok = boxes.sum(axis=(2, 4), dtype=np.int16).max(axis=(1, 2, 3)) <= 1
+    return in_range & row_ok & col_ok & box_ok
+
+
+def propagate(grids, max_passes=100):
+    '''
+    Run naked and hidden singles over an (N, n*n, n) candidate tensor until nothing changes
+
+    Each pass removes the values of solved cells from their peers, then fixes any
+    value that has only one possible cell left in a unit. Grids stop being
+    processed as soon as they are solved, contradicted or stop changing.
+
+    Parameters:
+        grids: (N, n, n) array of partial grids
+        max_passes: upper bound on propagation passes
+
+    Returns:
+        (valid, solved, stuck, result)
+        valid, solved and stuck are (N,) bool arrays. valid is False when the givens
+        break a rule or propagation finds a contradiction. solved grids were completed
+        by singles alone; stuck grids are valid but need more than singles.
+        result is an (N, n, n) array with every cell propagation could fill.
+    '''
+    grids, n = check_shape(grids)
+    count = len(grids)
+    cells = n * n
+
+    units = unit_matrix(n)
+    units_f = units.astype(np.float32)
+    # peers[i, j] is 1 when cells i and j share a unit
+    peers = ((units_f.T @ units_f) > 0).astype(np.float32)
+    np.fill_diagonal(peers, 0)
+
+    flat = grids.reshape(count, cells)
+    givens = flat[..., None] == np.arange(1, n + 1)
+    candidates = np.where((flat > 0)[..., None], givens, True)
+
+    valid = validate_grids(grids)
+    active = np.flatnonzero(valid)
+    for _ in range(max_passes):
+        if len(active) == 0:
+            break
+        cand = candidates[active]
+        before = cand.copy()
+
+        # Naked singles: a solved cell's value is removed from all of its peers
+        fixed = cand.sum(axis=2) == 1
+        placed = (cand & fixed[..., None]).astype(np.float32)
+        cand &= ~((peers @ placed) > 0)
+
+        # Hidden singles: a value with exactly one possible cell in a unit goes there
+        per_unit = units_f @ cand.astype(np.float32)
+        hidden = (units_f.T @ (per_unit == 1).astype(np.float32) > 0) & cand
+        has_hidden = hidden.any(axis=2)
+        cand = np.where(has_hidden[..., None], hidden, cand)
+
+        # Contradictions: a cell with no candidates, a cell forced to two values,
+        # or a value with no place left in some unit
+        broken = ((cand.sum(axis=2) == 0) | (hidden.sum(axis=2) > 1)).any(axis=1)
+        broken |= (per_unit == 0).any(axis=(1, 2))
+        candidates[active] = cand
+        valid[active[broken]] = False
+
+        done = (cand.sum(axis=2) == 1).all(axis=1)
+        changed = (cand != before).any(axis=(1, 2))
+        active = active[~broken & ~done & changed]
+
+    counts = candidates.sum(axis=2)
+    solved_cells = counts == 1
+    values = np.where(solved_cells, candidates.argmax(axis=2) + 1, 0)
+    result = values.reshape(count, n, n).astype(grids.dtype)
+
+    # A fully filled grid still has to pass the rules to count as solved
+    solved = valid & solved_cells.all(axis=1)
+    solved[solved] = validate_grids(result[solved])
+    valid &= ~(solved_cells.all(axis=1) & ~solved)
+    stuck = valid & ~solved
+    return valid, solved, stuck, result